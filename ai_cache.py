@@ -0,0 +1,283 @@
+"""
+Persistent cache for Gemini results
+
+AI pricing and descriptions are stored in a small SQLite file keyed by the
+normalized query and planet, so a repeated search (from any worker process, or
+after a restart) skips the model round trip. Entries expire after a TTL and the
+least recently used ones are evicted once the cache exceeds its size budget.
+A small in-process LRU sits in front of SQLite so hot keys cost microseconds.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+AI_CACHE_PATH = os.environ.get('SPACEBUY_AI_CACHE_PATH', 'ai_cache.db')
+AI_CACHE_TTL_SECONDS = float(os.environ.get('SPACEBUY_AI_CACHE_TTL_SECONDS', 24 * 3600))
+AI_CACHE_MAX_BYTES = int(os.environ.get('SPACEBUY_AI_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Entries held in the in-process LRU in front of SQLite
+AI_CACHE_MEMORY_ITEMS = int(os.environ.get('SPACEBUY_AI_CACHE_MEMORY_ITEMS', 4096))
+# Hits refresh an entry's LRU timestamp on disk at most this often
+ACCESS_UPDATE_SECONDS = 60
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_query(query):
+    """Case-, accent- and punctuation-insensitive form of a search query"""
+    text = unicodedata.normalize('NFKD', str(query).casefold())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(' ', text).strip()
+
+
+def cache_key(*parts):
+    """Stable key for the given parts (strings, numbers, dicts)"""
+    content = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class AICache:
+    """
+    SQLite-backed TTL + LRU cache of JSON-serializable values.
+
+    Safe to share between threads (one connection per thread) and between
+    processes using the same file (WAL mode, and the total size is tracked in
+    the same transactions as the entries).
+    """
+
+    def __init__(self, path=AI_CACHE_PATH, ttl=AI_CACHE_TTL_SECONDS, max_bytes=AI_CACHE_MAX_BYTES,
+                 memory_items=AI_CACHE_MEMORY_ITEMS):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, disk access time)
+        self._memory = OrderedDict()
+        self._counters = {'hits': 0, 'memory_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expired': 0}
+        self._initialized = False
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._initialized:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS ai_cache (
+                        key TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS ai_cache_accessed ON ai_cache (accessed_at)")
+                conn.execute("CREATE TABLE IF NOT EXISTS ai_cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                conn.execute("INSERT OR IGNORE INTO ai_cache_meta VALUES ('total_bytes', 0)")
+                self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _remember(self, key, value, expires_at, accessed_at):
+        with self._lock:
+            self._memory[key] = (value, expires_at, accessed_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, kind, key):
+        """Cached value or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+        if entry is not None and entry[1] > now:
+            value, expires_at, accessed_at = entry
+            self._count('hits')
+            self._count('memory_hits')
+            if now - accessed_at > ACCESS_UPDATE_SECONDS:
+                self._touch(key, now)
+                self._remember(key, value, expires_at, now)
+            return value
+
+        try:
+            row = self._connection().execute(
+                "SELECT value, created_at, accessed_at FROM ai_cache WHERE key = ? AND kind = ?", (key, kind)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"AI cache read error: {e}")
+            row = None
+
+        if row is None:
+            self._count('misses')
+            return None
+        value, created_at, accessed_at = row
+        if created_at + self.ttl <= now:
+            self._count('misses')
+            self._count('expired')
+            self.delete(key)
+            return None
+
+        value = json.loads(value)
+        if now - accessed_at > ACCESS_UPDATE_SECONDS:
+            self._touch(key, now)
+            accessed_at = now
+        self._remember(key, value, created_at + self.ttl, accessed_at)
+        self._count('hits')
+        return value
+
+    def expires_in(self, kind, key):
+        """Seconds until an entry expires (negative once expired), or None if absent"""
+        try:
+            row = self._connection().execute(
+                "SELECT created_at FROM ai_cache WHERE key = ? AND kind = ?", (key, kind)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"AI cache read error: {e}")
+            return None
+        return None if row is None else row[0] + self.ttl - time.time()
+
+    def _touch(self, key, now):
+        try:
+            self._connection().execute("UPDATE ai_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"AI cache write error: {e}")
+
+    def set(self, kind, key, value):
+        """Store a value, evicting least recently used entries over the size budget"""
+        now = time.time()
+        data = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        self._remember(key, value, now + self.ttl, now)
+        self._count('sets')
+
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute("SELECT size FROM ai_cache WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, data, size, now, now)
+                )
+                conn.execute(
+                    "UPDATE ai_cache_meta SET value = value + ? WHERE name = 'total_bytes'",
+                    (size - (old[0] if old else 0),)
+                )
+                evicted = self._evict(conn, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"AI cache write error: {e}")
+            return
+
+        if evicted:
+            self._count('evictions', len(evicted))
+            with self._lock:
+                for evicted_key in evicted:
+                    self._memory.pop(evicted_key, None)
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then LRU entries until under budget; returns their keys"""
+        total = conn.execute("SELECT value FROM ai_cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+
+        evicted = []
+        expired = conn.execute(
+            "SELECT key, size FROM ai_cache WHERE created_at <= ?", (now - self.ttl,)
+        ).fetchall()
+        for key, size in expired:
+            evicted.append(key)
+            total -= size
+        if total > self.max_bytes:
+            # Expired rows are already in evicted; skip them here rather than by lookup
+            lru = conn.execute(
+                "SELECT key, size FROM ai_cache WHERE created_at > ? ORDER BY accessed_at", (now - self.ttl,)
+            )
+            for key, size in lru:
+                if total <= self.max_bytes:
+                    break
+                evicted.append(key)
+                total -= size
+
+        conn.executemany("DELETE FROM ai_cache WHERE key = ?", [(key,) for key in evicted])
+        conn.execute("UPDATE ai_cache_meta SET value = ? WHERE name = 'total_bytes'", (total,))
+        return evicted
+
+    def delete(self, key):
+        """Remove one entry"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT size FROM ai_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                conn.execute("UPDATE ai_cache_meta SET value = value - ? WHERE name = 'total_bytes'", (row[0],))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"AI cache write error: {e}")
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._memory.clear()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM ai_cache")
+            conn.execute("UPDATE ai_cache_meta SET value = 0 WHERE name = 'total_bytes'")
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"AI cache write error: {e}")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the cache's current size"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        try:
+            conn = self._connection()
+            stats['entries'] = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+            stats['bytes'] = conn.execute("SELECT value FROM ai_cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"AI cache read error: {e}")
+        stats['max_bytes'] = self.max_bytes
+        stats['ttl_seconds'] = self.ttl
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ai_cache():
+    """The process-wide AICache, configured from SPACEBUY_AI_CACHE_* variables"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AICache()
+    return _cache
@@ -0,0 +1,222 @@
+"""
+Instrumentation for SpaceBuy's Gemini calls
+
+Every Gemini call records its latency, prompt and response sizes and reported
+token usage; the AI layer also counts JSON parse failures, deadline misses,
+fallback answers and cache lookups, and the rate limiter its queue depth and
+wait times. Metrics are per process and exported in
+Prometheus text format (/metrics) and as a JSON summary (/api/ai-metrics).
+"""
+
+import threading
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'spacebuy_ai_call_seconds': ('histogram', 'Gemini call latency', LATENCY_BUCKETS),
+    'spacebuy_ai_prompt_chars': ('histogram', 'Gemini prompt size in characters', SIZE_BUCKETS),
+    'spacebuy_ai_response_chars': ('histogram', 'Gemini response size in characters', SIZE_BUCKETS),
+    'spacebuy_ai_calls_total': ('counter', 'Gemini calls by outcome', None),
+    'spacebuy_ai_tokens_total': ('counter', 'Tokens reported by Gemini', None),
+    'spacebuy_ai_parse_failures_total': ('counter', 'Gemini responses that were not valid JSON for the schema', None),
+    'spacebuy_ai_deadline_misses_total': ('counter', 'AI results not ready by the caller deadline', None),
+    'spacebuy_ai_fallbacks_total': ('counter', 'Answers served by fallback pricing or descriptions', None),
+    'spacebuy_ai_cache_lookups_total': ('counter', 'AI cache lookups by result', None),
+    'spacebuy_ai_queue_wait_seconds': ('histogram', 'Time Gemini calls queued for a rate limit token', LATENCY_BUCKETS),
+    'spacebuy_ai_throttled_total': ('counter', 'Gemini calls that gave up waiting for a rate limit token', None),
+    'spacebuy_ai_queue_depth': ('gauge', 'Gemini calls currently queued for a rate limit token', None),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts, Prometheus style)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, below = 0.0, 0
+        for bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= rank:
+                inside = cumulative - below
+                return lower + (bound - lower) * ((rank - below) / inside if inside else 1.0)
+            lower, below = bound, cumulative
+        # Beyond the last bucket: the best we can say is "above it"
+        return self.buckets[-1]
+
+
+def _labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+class AIMetrics:
+    """Thread-safe counters, gauges and histograms keyed by metric name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def record_call(self, kind, seconds, prompt_chars, response_chars=None, usage=None, outcome='ok'):
+        """
+        One Gemini call. usage is the response's usage_metadata (or None);
+        outcome is 'ok', 'error' or 'throttled' (no rate limit token in time).
+        """
+        self.inc('spacebuy_ai_calls_total', kind=kind, outcome=outcome)
+        self.observe('spacebuy_ai_call_seconds', seconds, kind=kind)
+        self.observe('spacebuy_ai_prompt_chars', prompt_chars, kind=kind)
+        if response_chars is not None:
+            self.observe('spacebuy_ai_response_chars', response_chars, kind=kind)
+        if usage is not None:
+            for token_type, field in (('prompt', 'prompt_token_count'), ('response', 'candidates_token_count')):
+                tokens = getattr(usage, field, None)
+                if tokens:
+                    self.inc('spacebuy_ai_tokens_total', tokens, kind=kind, type=token_type)
+
+    def record_parse_failure(self, kind):
+        self.inc('spacebuy_ai_parse_failures_total', kind=kind)
+
+    def record_deadline_miss(self, kind):
+        self.inc('spacebuy_ai_deadline_misses_total', kind=kind)
+
+    def record_fallback(self, kind):
+        self.inc('spacebuy_ai_fallbacks_total', kind=kind)
+
+    def record_cache(self, kind, result):
+        """result is 'hit', 'similar' (near-duplicate query) or 'miss'"""
+        self.inc('spacebuy_ai_cache_lookups_total', kind=kind, result=result)
+
+    def _snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            }
+        return counters, histograms
+
+    def prometheus(self):
+        """All metrics in Prometheus text exposition format"""
+        counters, histograms = self._snapshot()
+        lines = []
+        for name, (metric_type, help_text, _) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type in ('counter', 'gauge'):
+                for (counter_name, labels), value in sorted(counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{name}{{{_labels(labels)}}} {value}")
+                continue
+            for (histogram_name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                prefix = _labels(labels) + ',' if labels else ''
+                for bound, cumulative in zip(buckets, counts):
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{_labels(labels)}}} {total}")
+                lines.append(f"{name}_count{{{_labels(labels)}}} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Per-kind digest: calls, errors, latency percentiles, sizes, tokens, cache and fallback rates"""
+        counters, _ = self._snapshot()
+        with self._lock:
+            histograms = dict(self._histograms)
+        kinds = {}
+
+        def entry(kind):
+            return kinds.setdefault(kind, {
+                'calls': 0, 'errors': 0, 'parse_failures': 0, 'deadline_misses': 0, 'fallbacks': 0,
+                'prompt_tokens': 0, 'response_tokens': 0, 'cache': {'hit': 0, 'similar': 0, 'miss': 0},
+            })
+
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if 'kind' not in labels:
+                # Rate limiter metrics are per priority class, not per kind
+                continue
+            stats = entry(labels['kind'])
+            if name == 'spacebuy_ai_calls_total':
+                stats['calls'] += value
+                if labels['outcome'] != 'ok':
+                    stats['errors'] += value
+            elif name == 'spacebuy_ai_tokens_total':
+                stats[f"{labels['type']}_tokens"] += value
+            elif name == 'spacebuy_ai_cache_lookups_total':
+                stats['cache'][labels['result']] += value
+            else:
+                field = name[len('spacebuy_ai_'):-len('_total')]
+                stats[field] += value
+
+        for (name, labels), histogram in histograms.items():
+            labels = dict(labels)
+            if 'kind' not in labels:
+                continue
+            stats = entry(labels['kind'])
+            with self._lock:
+                count, total = histogram.count, histogram.sum
+                quantiles = {q: histogram.quantile(q) for q in (0.5, 0.95, 0.99)}
+            if name == 'spacebuy_ai_call_seconds':
+                stats['latency_seconds'] = {
+                    'mean': total / count if count else None,
+                    'p50': quantiles[0.5], 'p95': quantiles[0.95], 'p99': quantiles[0.99],
+                }
+            else:
+                stats[f"mean_{name[len('spacebuy_ai_'):]}"] = total / count if count else None
+
+        for stats in kinds.values():
+            lookups = sum(stats['cache'].values())
+            stats['cache']['hit_ratio'] = (stats['cache']['hit'] + stats['cache']['similar']) / lookups if lookups else 0.0
+        return kinds
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_ai_metrics():
+    """The process-wide AIMetrics"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = AIMetrics()
+    return _metrics
@@ -4,16 +4,347 @@ AI-powered pricing system using Gemini AI for dynamic interplanetary pricing
 
 import os
 import json
-import random
-from google import genai
-from google.genai import types
+import time
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
-# Initialize Gemini client
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", "default_gemini_key"))
+from utils import seeded_random
+from ai_cache import get_ai_cache, cache_key, normalize_query
+from singleflight import get_singleflight
+from circuit_breaker import gemini_breaker
+from query_index import get_query_index
+from price_classifier import get_price_classifier
+from ai_metrics import get_ai_metrics
+from rate_limiter import gemini_limiter, RateLimited
 
-def get_ai_pricing(product_name, planet_info):
+# Upper bound on any single Gemini HTTP request, so background calls never hang
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get('SPACEBUY_GEMINI_TIMEOUT_SECONDS', 60))
+# Alternative Gemini endpoint, e.g. mock_gemini.py for load tests; unset means Google's API
+GEMINI_BASE_URL = os.environ.get('SPACEBUY_GEMINI_BASE_URL')
+
+AI_MODEL = "gemini-2.5-flash"
+# Planet fields the pricing prompt uses, and so the pricing cache key
+PRICING_PLANET_FIELDS = ('distance', 'gravity', 'atmosphere', 'delivery_difficulty')
+# Threads available for concurrent Gemini calls
+AI_WORKERS = int(os.environ.get('SPACEBUY_AI_WORKERS', 16))
+# How long get_ai_pricing / generate_product_description wait for Gemini before
+# answering with their fallback (the call keeps running to fill the cache)
+AI_DEADLINE_SECONDS = float(os.environ.get('SPACEBUY_AI_DEADLINE_SECONDS', 8))
+# Shared deadline for an AI search's description and pricing calls
+AI_SEARCH_DEADLINE_SECONDS = float(os.environ.get('SPACEBUY_AI_SEARCH_DEADLINE_SECONDS', AI_DEADLINE_SECONDS))
+# Near-duplicate matches tried per pricing lookup when matched entries have expired
+SIMILAR_QUERY_ATTEMPTS = 3
+
+_client = None
+_client_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+# key -> Future of the cache fill running for it in this process
+_fills = {}
+# key -> _ChunkLog of the fill for it, when that fill is a Gemini stream
+_streams = {}
+_fills_lock = threading.Lock()
+
+def get_gemini_client():
+    """
+    The Gemini client, created on first use
+
+    The genai SDK takes about half a second to import, so it is only loaded by
+    processes that actually make an AI call.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                from google.genai import types
+                _client = genai.Client(
+                    api_key=os.environ.get("GEMINI_API_KEY", "default_gemini_key"),
+                    http_options=types.HttpOptions(
+                        timeout=int(GEMINI_TIMEOUT_SECONDS * 1000),
+                        base_url=GEMINI_BASE_URL
+                    )
+                )
+    return _client
+
+def _json_config():
+    """Generation config asking Gemini for a JSON response"""
+    from google.genai import types
+    return types.GenerateContentConfig(response_mime_type="application/json")
+
+def _call_gemini(kind, prompt, json_response=False, priority=None):
+    """
+    generate_content with rate limiting, metrics and circuit breaker
+    bookkeeping; kind labels the call in AI metrics. The call first queues for
+    a rate limit token at priority (default: the caller's ai_priority class).
+    Raises RateLimited if none comes in time, else whatever the client raises.
+    """
+    config = _json_config() if json_response else None
+    started = time.perf_counter()
+    try:
+        gemini_limiter.acquire_or_raise(priority)
+    except RateLimited:
+        # Our own throttling says nothing about Gemini's health: no breaker failure
+        get_ai_metrics().record_call(kind, time.perf_counter() - started, len(prompt), outcome='throttled')
+        raise
+    try:
+        response = get_gemini_client().models.generate_content(model=AI_MODEL, contents=prompt, config=config)
+    except Exception:
+        gemini_breaker.record_failure()
+        get_ai_metrics().record_call(kind, time.perf_counter() - started, len(prompt), outcome='error')
+        raise
+    gemini_breaker.record_success()
+    get_ai_metrics().record_call(
+        kind, time.perf_counter() - started, len(prompt), len(response.text or ''), response.usage_metadata
+    )
+    return response
+
+def _parse_json(kind, text):
+    """Decoded JSON of a Gemini response, or None (counted as a parse failure)"""
+    try:
+        return json.loads(text or '')
+    except ValueError:
+        get_ai_metrics().record_parse_failure(kind)
+        return None
+
+def get_ai_executor():
+    """Thread pool Gemini calls run on"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=AI_WORKERS, thread_name_prefix='gemini')
+    return _executor
+
+def pricing_cache_key(product_name, planet_info):
+    """AI cache key for a product's pricing on a planet"""
+    planet = {field: planet_info[field] for field in PRICING_PLANET_FIELDS}
+    return cache_key('pricing', AI_MODEL, normalize_query(product_name), planet)
+
+def pricing_scope(planet_info):
+    """Query index scope for pricing: queries only match others for the same planet"""
+    planet = {field: planet_info[field] for field in PRICING_PLANET_FIELDS}
+    return cache_key('pricing', AI_MODEL, planet)
+
+def description_cache_key(product_name, planet_name):
+    """AI cache key for a product's description for a planet"""
+    return cache_key('description', AI_MODEL, normalize_query(product_name), planet_name)
+
+def get_ai_pricing(product_name, planet_info, seed=None, timeout=None):
     """
     Use Gemini AI to generate realistic pricing for products on different planets
+
+    Results are cached by normalized product name and planet (see ai_cache),
+    and a near-duplicate of an already priced query for the same planet reuses
+    that price (see query_index); fallback pricing is never cached. If Gemini
+    has not answered within timeout (AI_DEADLINE_SECONDS by default) the
+    fallback is returned right away while the call finishes in the background
+    and fills the cache. seed makes the fallback pricing reproducible when the
+    AI is unavailable.
+    """
+    pricing_data = _wait(start_ai_pricing(product_name, planet_info), timeout, 'pricing')
+    if pricing_data is None:
+        return get_fallback_pricing(product_name, planet_info, seed)
+    return dict(pricing_data)
+
+def start_ai_pricing(product_name, planet_info):
+    """
+    Future of the validated AI pricing (or None if Gemini fails), already
+    resolved on a cache hit
+    """
+    key = pricing_cache_key(product_name, planet_info)
+    cached = _cached_pricing(product_name, planet_info, key)
+    if cached is not None:
+        return _resolved(cached)
+
+    remember = lambda: get_query_index().add('pricing', pricing_scope(planet_info), product_name, key)
+    return _start_fill('pricing', key, _generate_pricing, product_name, planet_info, on_fill=remember)
+
+def _cached_pricing(product_name, planet_info, key):
+    """Cached pricing for the query, or for a near-duplicate of it, or None"""
+    cache = get_ai_cache()
+    metrics = get_ai_metrics()
+    cached = cache.get('pricing', key)
+    if cached is not None:
+        metrics.record_cache('pricing', 'hit')
+        return cached
+
+    index = get_query_index()
+    scope = pricing_scope(planet_info)
+    for _ in range(SIMILAR_QUERY_ATTEMPTS):
+        match = index.find('pricing', scope, product_name)
+        if match is None:
+            break
+        similar_query, similar_key = match
+        cached = cache.get('pricing', similar_key)
+        if cached is not None:
+            metrics.record_cache('pricing', 'similar')
+            return cached
+        # The matched query's cache entry expired or was evicted; forget it
+        # and try the next best match
+        index.discard('pricing', scope, similar_query)
+    metrics.record_cache('pricing', 'miss')
+    return None
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+class _ChunkLog:
+    """Chunks of a streamed Gemini response, readable by any number of followers while it grows"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._chunks = []
+        self._closed = False
+
+    def append(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self, index, timeout=None):
+        """
+        Chunk number index, waiting for it if need be; None once the stream
+        closed without it. Raises FutureTimeoutError after timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: index < len(self._chunks) or self._closed, timeout):
+                raise FutureTimeoutError()
+            return self._chunks[index] if index < len(self._chunks) else None
+
+    def follow(self, start=0):
+        """Yield every chunk from start on, as they arrive, until the stream closes"""
+        index = start
+        while (chunk := self.get(index)) is not None:
+            yield chunk
+            index += 1
+
+def _start_fill(kind, key, generate, *args, on_fill=None):
+    """
+    Future for the background fill of a missing cache entry
+
+    One fill per key runs in this process at a time; across processes the
+    single-flight lock does the same (see singleflight). on_fill, if given, is
+    called once the value is cached, before the future resolves.
+    """
+    return _begin_fill(kind, key, generate, args, on_fill)[0]
+
+def _begin_fill(kind, key, generate, args, on_fill=None, chunks=None):
+    """
+    (future, chunk log) of the fill for key, starting one if none is running
+
+    chunks, if given, is passed to generate as its last argument and
+    published for other streams of the same key; it is unused when a fill is
+    already running. The chunk log returned is the running fill's (None for
+    a fill that does not stream).
+    """
+    with _fills_lock:
+        future = _fills.get(key)
+        if future is not None:
+            return future, _streams.get(key)
+        if chunks is not None:
+            args = args + (chunks,)
+            _streams[key] = chunks
+        # Pool threads don't inherit contextvars; carry the caller's (its ai_priority)
+        future = get_ai_executor().submit(contextvars.copy_context().run, _fill, kind, key, generate, args, on_fill)
+        _fills[key] = future
+    # Outside the lock: a fill that already finished runs the callback right here
+    future.add_done_callback(lambda done: _forget_fill(key, done))
+    return future, chunks
+
+def _forget_fill(key, future):
+    with _fills_lock:
+        if _fills.get(key) is not future:
+            return
+        del _fills[key]
+        chunks = _streams.pop(key, None)
+    if chunks is not None:
+        # Followers of a fill that never streamed (cache hit, open breaker,
+        # failure) fall back to its result
+        chunks.close()
+
+def _wait(future, timeout, kind):
+    """Result of an AI future within timeout (AI_DEADLINE_SECONDS), or None"""
+    try:
+        return future.result(timeout=AI_DEADLINE_SECONDS if timeout is None else max(0.0, timeout))
+    except FutureTimeoutError:
+        get_ai_metrics().record_deadline_miss(kind)
+        print(f"AI {kind} deadline missed; using fallback while Gemini finishes in the background")
+    except Exception as e:
+        print(f"AI {kind} error: {e}")
+    return None
+
+def _fill(kind, key, generate, args, on_fill):
+    value = get_singleflight().do(key, _fill_cache, kind, key, generate, *args)
+    if value is not None and on_fill is not None:
+        on_fill()
+    return value
+
+def _fill_cache(kind, key, generate, *args):
+    """
+    Single-flight leader body: generate a value and cache it if valid
+
+    Re-checks the cache first, since with cross-process locking another worker
+    may have filled it while this one waited for the lock. Skips Gemini while
+    the circuit breaker is open.
+    """
+    cached = get_ai_cache().get(kind, key)
+    if cached is not None:
+        return cached
+    return _generate_and_cache(kind, key, generate, *args)
+
+def _generate_and_cache(kind, key, generate, *args):
+    """Generate a value with Gemini (unless the breaker is open) and cache it if valid"""
+    if not gemini_breaker.allow():
+        return None
+    value = generate(*args)
+    if value is not None:
+        get_ai_cache().set(kind, key, value)
+    return value
+
+def _refresh(kind, key, generate, *args, on_fill=None):
+    """
+    Regenerate and re-cache a value whether or not it is cached; value or None
+
+    The rate limit token is taken before leading the single-flight call, so an
+    interactive request that joins a background refresh waits for the Gemini
+    call only, never for the background queue.
+    """
+    try:
+        with gemini_limiter.reserved():
+            value = get_singleflight().do(key, _generate_and_cache, kind, key, generate, *args)
+    except RateLimited as e:
+        print(f"AI {kind} refresh skipped: {e}")
+        return None
+    if value is not None and on_fill is not None:
+        on_fill()
+    return value
+
+def refresh_ai_pricing(product_name, planet_info):
+    """
+    Ask Gemini for fresh pricing and cache it, even if cached already (for the
+    cache warmer); returns the pricing or None if Gemini failed
+    """
+    key = pricing_cache_key(product_name, planet_info)
+    remember = lambda: get_query_index().add('pricing', pricing_scope(planet_info), product_name, key)
+    return _refresh('pricing', key, _generate_pricing, product_name, planet_info, on_fill=remember)
+
+def refresh_product_description(product_name, planet_name):
+    """refresh_ai_pricing for descriptions"""
+    key = description_cache_key(product_name, planet_name)
+    return _refresh('description', key, _generate_description, product_name, planet_name)
+
+def _generate_pricing(product_name, planet_info):
+    """
+    Ask Gemini for pricing; returns the validated pricing dict or None
     """
     try:
         prompt = f"""
@@ -42,33 +373,175 @@ def get_ai_pricing(product_name, planet_info):
         Make the reasoning humorous but scientifically plausible. Include some Indian references for relatability. Be creative!
         """
         
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            )
+        response = _call_gemini('pricing', prompt, json_response=True)
+        parsed = _parse_json('pricing', response.text)
+        pricing_data = validate_pricing(parsed)
+        if pricing_data is None and parsed is not None:
+            # Valid JSON, but not valid pricing
+            get_ai_metrics().record_parse_failure('pricing')
+        return pricing_data
+        
+    except Exception as e:
+        print(f"AI Pricing Error: {e}")
+        return None
+
+def validate_pricing(pricing_data):
+    """
+    Normalized pricing dict if pricing_data has a positive base price and
+    multiplier and a reasoning string, otherwise None
+    """
+    if not isinstance(pricing_data, dict):
+        return None
+    try:
+        base_price = float(pricing_data['base_price'])
+        multiplier = float(pricing_data['multiplier'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    reasoning = pricing_data.get('reasoning')
+    if not (base_price > 0 and multiplier > 0 and base_price < float('inf') and multiplier < float('inf')):
+        return None
+    if not isinstance(reasoning, str) or not reasoning.strip():
+        return None
+    return {'base_price': base_price, 'multiplier': multiplier, 'reasoning': reasoning}
+
+def batch_pricing_cache_key(product_name, planets):
+    """AI cache key for a product's batch pricing over several planets"""
+    planets = {
+        name: {field: info[field] for field in PRICING_PLANET_FIELDS} for name, info in planets.items()
+    }
+    return cache_key('batch_pricing', AI_MODEL, normalize_query(product_name), planets)
+
+def get_batch_ai_pricing(product_name, planets, seeds=None, timeout=None):
+    """
+    Price one product for many planets with a single Gemini call
+
+    planets maps planet name to planet info; seeds optionally maps planet name to
+    the fallback seed for that planet. Cached planets (including near-duplicate
+    queries) are answered from the AI cache and only the rest go into one prompt. Every entry of the reply is
+    validated; missing or invalid ones (or all of them while the circuit breaker
+    is open) get get_fallback_pricing. Valid entries
+    are cached under the same keys get_ai_pricing uses. Like get_ai_pricing, the
+    call is deadline-bound: planets Gemini has not priced within timeout
+    (AI_DEADLINE_SECONDS by default) get the fallback while the call finishes in
+    the background. Returns {planet: pricing}.
+    """
+    seeds = seeds or {}
+    results = {}
+    missing = {}
+    for planet_name, planet_info in planets.items():
+        key = pricing_cache_key(product_name, planet_info)
+        cached = _cached_pricing(product_name, planet_info, key)
+        if cached is not None:
+            results[planet_name] = dict(cached)
+        else:
+            missing[planet_name] = planet_info
+
+    if missing:
+        key = batch_pricing_cache_key(product_name, missing)
+        future = _start_fill('batch_pricing', key, _generate_batch_fill, product_name, missing)
+        generated = _wait(future, timeout, 'batch_pricing') or {}
+        for planet_name, planet_info in missing.items():
+            pricing_data = generated.get(planet_name)
+            if pricing_data is None:
+                results[planet_name] = get_fallback_pricing(product_name, planet_info, seeds.get(planet_name))
+            else:
+                results[planet_name] = dict(pricing_data)
+
+    # Keep the caller's planet order
+    return {planet_name: results[planet_name] for planet_name in planets}
+
+def _generate_batch_fill(product_name, planets):
+    """
+    Batch pricing from Gemini, validated: valid entries are cached per planet
+    and returned as {planet: pricing}, or None if there are none
+    """
+    generated = _generate_batch_pricing(product_name, planets)
+    priced = {}
+    for planet_name, planet_info in planets.items():
+        pricing_data = validate_pricing(generated.get(planet_name))
+        if pricing_data is None:
+            if planet_name in generated:
+                get_ai_metrics().record_parse_failure('batch_pricing')
+            continue
+        key = pricing_cache_key(product_name, planet_info)
+        get_ai_cache().set('pricing', key, pricing_data)
+        get_query_index().add('pricing', pricing_scope(planet_info), product_name, key)
+        priced[planet_name] = pricing_data
+    return priced or None
+
+def _generate_batch_pricing(product_name, planets):
+    """
+    Ask Gemini for pricing on several planets at once; returns the raw
+    {planet: pricing} map (entries unvalidated) or {} on failure
+    """
+    try:
+        planet_lines = "\n".join(
+            f"        - {name}: distance {info['distance']} AU, gravity {info['gravity']}g, "
+            f"atmosphere {info['atmosphere']}, delivery difficulty {info['delivery_difficulty']}/10"
+            for name, info in planets.items()
         )
+        prompt = f"""
+        You are a cosmic pricing expert for SpaceBuy, an interplanetary e-commerce platform serving Indian customers.
         
-        if response.text:
-            pricing_data = json.loads(response.text)
-            # Validate response structure
-            if all(key in pricing_data for key in ['base_price', 'multiplier', 'reasoning']):
-                return pricing_data
+        Calculate a realistic price for "{product_name}" to be delivered to EACH of these planets:
+{planet_lines}
+        
+        Consider factors like:
+        1. Base Earth retail price for this product in USD (the same for every planet)
+        2. Shipping complexity based on distance and conditions
+        3. Special handling requirements for the atmosphere/gravity
+        4. Insurance costs for high-risk deliveries
+        5. Fuel costs proportional to distance and gravity
+        
+        Respond with a JSON object with one entry per planet name listed above, in this exact format:
+        {{
+            "[planet name]": {{
+                "base_price": [estimated Earth price in USD],
+                "multiplier": [price multiplier for this planet, between 50x and 1000x - make it VERY expensive],
+                "reasoning": "[funny but logical explanation for the ridiculously high pricing, with some Indian context or references]"
+            }}
+        }}
         
-        # Fallback if AI response is invalid
-        return get_fallback_pricing(product_name, planet_info)
+        Make the reasoning humorous but scientifically plausible. Include some Indian references for relatability. Be creative!
+        """
+        
+        response = _call_gemini('batch_pricing', prompt, json_response=True)
+        pricing_map = _parse_json('batch_pricing', response.text)
+        if isinstance(pricing_map, dict):
+            return pricing_map
+        return {}
         
     except Exception as e:
-        print(f"AI Pricing Error: {e}")
-        return get_fallback_pricing(product_name, planet_info)
+        print(f"AI Batch Pricing Error: {e}")
+        return {}
 
-def generate_product_description(product_name, planet_name):
+def generate_product_description(product_name, planet_name, timeout=None):
     """
     Generate AI-powered product descriptions adapted for interplanetary delivery
+
+    Cached, deadline-bound and filled in the background like get_ai_pricing;
+    fallback descriptions are never cached.
     """
-    try:
-        prompt = f"""
+    description = _wait(start_product_description(product_name, planet_name), timeout, 'description')
+    if description is None:
+        return get_fallback_description(product_name, planet_name)
+    return description
+
+def start_product_description(product_name, planet_name):
+    """
+    Future of the AI description (or None if Gemini fails), already resolved
+    on a cache hit
+    """
+    key = description_cache_key(product_name, planet_name)
+    cached = get_ai_cache().get('description', key)
+    get_ai_metrics().record_cache('description', 'miss' if cached is None else 'hit')
+    if cached is not None:
+        return _resolved(cached)
+    return _start_fill('description', key, _generate_description, product_name, planet_name)
+
+def _description_prompt(product_name, planet_name):
+    """Prompt for a product description"""
+    return f"""
         You are a creative copywriter for SpaceBuy, an interplanetary e-commerce platform.
         
         Write a humorous but detailed product description for "{product_name}" that will be delivered to {planet_name}.
@@ -82,52 +555,176 @@ def generate_product_description(product_name, planet_name):
         Keep it engaging, funny, and about 3-4 sentences long.
         Write in a marketing style but with space-themed humor.
         """
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
-        
+
+def _generate_description(product_name, planet_name):
+    """
+    Ask Gemini for a description; returns the text or None
+    """
+    try:
+        response = _call_gemini('description', _description_prompt(product_name, planet_name))
         if response.text:
             return response.text.strip()
-        else:
-            return get_fallback_description(product_name, planet_name)
+        return None
             
     except Exception as e:
         print(f"AI Description Error: {e}")
-        return get_fallback_description(product_name, planet_name)
+        return None
+
+def get_ai_search_results(product_name, planet_name, planet_info, seed=None, timeout=None):
+    """
+    Description and pricing for an AI search, generated concurrently
+
+    Both calls share one deadline (AI_SEARCH_DEADLINE_SECONDS unless timeout is
+    given), so the wait is the slower of the two rather than their sum. A call
+    that misses the deadline or fails is answered with its fallback; a late
+    Gemini result still lands in the AI cache for the next search.
+    Returns (description, pricing).
+    """
+    deadline = time.monotonic() + (AI_SEARCH_DEADLINE_SECONDS if timeout is None else timeout)
+    description_future = start_product_description(product_name, planet_name)
+    pricing_future = start_ai_pricing(product_name, planet_info)
+
+    pricing = _wait(pricing_future, deadline - time.monotonic(), 'pricing')
+    if pricing is None:
+        pricing = get_fallback_pricing(product_name, planet_info, seed)
+    else:
+        pricing = dict(pricing)
+
+    description = _wait(description_future, deadline - time.monotonic(), 'description')
+    if description is None:
+        description = get_fallback_description(product_name, planet_name, seed)
+
+    return description, pricing
+
+def stream_product_description(product_name, planet_name, seed=None):
+    """
+    Yield a product description in chunks as Gemini generates it
+
+    A cached description (or one a non-streaming fill is already generating)
+    comes as a single chunk. Concurrent streams of the same description share
+    one Gemini stream (see start_description_stream). A complete streamed
+    description is cached; if Gemini fails before sending anything, or the
+    circuit breaker is open, the fallback description is yielded instead.
+    """
+    future, chunks = start_description_stream(product_name, planet_name)
+    sent = False
+    if chunks is not None:
+        for chunk in chunks.follow():
+            sent = True
+            yield chunk
+    if not sent:
+        yield _wait(future, None, 'description') or get_fallback_description(product_name, planet_name, seed)
+
+def start_description_stream(product_name, planet_name):
+    """
+    (future, chunk log) for a product description, streamed from Gemini
+
+    On a miss, one background fill per description streams it from Gemini and
+    publishes its chunks, so every concurrent request for the same description
+    follows that single upstream call; the future resolves to the full text
+    (or None). The chunk log is None on a cache hit, and when a non-streaming
+    fill is already generating the description: wait on the future instead.
+    """
+    key = description_cache_key(product_name, planet_name)
+    cached = get_ai_cache().get('description', key)
+    get_ai_metrics().record_cache('description', 'miss' if cached is None else 'hit')
+    if cached is not None:
+        return _resolved(cached), None
+    return _begin_fill(
+        'description', key, _stream_description, (product_name, planet_name), chunks=_ChunkLog()
+    )
+
+def _stream_description(product_name, planet_name, chunks):
+    """
+    Stream a description from Gemini into chunks; returns the full text or None
+    """
+    prompt = _description_prompt(product_name, planet_name)
+    parts = []
+    usage = None
+    started = time.perf_counter()
+    try:
+        gemini_limiter.acquire_or_raise()
+    except RateLimited as e:
+        get_ai_metrics().record_call('description_stream', time.perf_counter() - started, len(prompt), outcome='throttled')
+        print(f"AI Description Stream Error: {e}")
+        return None
+    try:
+        for chunk in get_gemini_client().models.generate_content_stream(model=AI_MODEL, contents=prompt):
+            # Token counts arrive with the last chunk
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                parts.append(chunk.text)
+                chunks.append(chunk.text)
+        gemini_breaker.record_success()
+    except Exception as e:
+        gemini_breaker.record_failure()
+        get_ai_metrics().record_call(
+            'description_stream', time.perf_counter() - started, len(prompt), sum(map(len, parts)), usage, outcome='error'
+        )
+        print(f"AI Description Stream Error: {e}")
+        return None
+    get_ai_metrics().record_call('description_stream', time.perf_counter() - started, len(prompt), sum(map(len, parts)), usage)
+    return ''.join(parts).strip() or None
 
-def get_fallback_pricing(product_name, planet_info):
+def stream_ai_search(product_name, planet_name, planet_info, seed=None, timeout=None):
+    """
+    Progressive version of get_ai_search_results
+
+    Yields ('pricing', pricing) as soon as pricing is ready (or its fallback at
+    the deadline), then ('description', chunk) for each piece of the streamed
+    description. The description streams from the start on the AI thread pool,
+    so its chunks are already waiting by the time pricing is sent. If no chunk
+    arrives before the deadline, the fallback description is yielded instead
+    and the stream carries on in the background to fill the cache.
+    """
+    deadline = time.monotonic() + (AI_SEARCH_DEADLINE_SECONDS if timeout is None else timeout)
+    description_future, chunks = start_description_stream(product_name, planet_name)
+    pricing_future = start_ai_pricing(product_name, planet_info)
+
+    pricing = _wait(pricing_future, deadline - time.monotonic(), 'pricing')
+    yield 'pricing', get_fallback_pricing(product_name, planet_info, seed) if pricing is None else dict(pricing)
+
+    chunk = None
+    if chunks is not None:
+        try:
+            chunk = chunks.get(0, timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            get_ai_metrics().record_deadline_miss('description')
+            print("AI Description deadline missed; using fallback while Gemini finishes in the background")
+            yield 'description', get_fallback_description(product_name, planet_name, seed)
+            return
+    if chunk is None:
+        # Cached, generated without streaming, or the stream failed before its first chunk
+        description = _wait(description_future, deadline - time.monotonic(), 'description')
+        yield 'description', description or get_fallback_description(product_name, planet_name, seed)
+        return
+    # Once the model is talking, chunks are bounded by the client's HTTP timeout
+    yield 'description', chunk
+    for chunk in chunks.follow(start=1):
+        yield 'description', chunk
+
+def get_fallback_pricing(product_name, planet_info, seed=None):
     """
     Fallback pricing when AI is unavailable
+
+    Pass a seed (e.g. utils.quote_seed) to get the same pricing for repeated requests.
+    Every call counts as a fallback in AI metrics.
     """
-    # Estimate base price based on product type keywords
-    base_price = 50.0  # Default
-    product_lower = product_name.lower()
-    
-    if any(word in product_lower for word in ['iphone', 'phone', 'smartphone']):
-        base_price = 999.0
-    elif any(word in product_lower for word in ['tesla', 'car', 'vehicle']):
-        base_price = 50000.0
-    elif any(word in product_lower for word in ['coffee', 'latte', 'drink']):
-        base_price = 5.0
-    elif any(word in product_lower for word in ['laptop', 'computer', 'macbook']):
-        base_price = 1500.0
-    elif any(word in product_lower for word in ['pizza', 'food']):
-        base_price = 15.0
-    elif any(word in product_lower for word in ['watch', 'rolex']):
-        base_price = 5000.0
+    get_ai_metrics().record_fallback('pricing')
+    rng = seeded_random(seed)
+    # Estimate base price from the catalog products the query mentions
+    base_price = get_price_classifier().base_price(product_name)
     
     # Calculate much higher multiplier based on planet difficulty
     difficulty = planet_info.get('delivery_difficulty', 5.0)
     distance = planet_info.get('distance', 1.0)
     
     # Much higher base multiplier with more aggressive scaling
-    multiplier = max(50.0, difficulty * distance * random.uniform(20.0, 100.0))
+    multiplier = max(50.0, difficulty * distance * rng.uniform(20.0, 100.0))
     
     # Additional penalties for extreme conditions
     if difficulty >= 9.0:
-        multiplier *= random.uniform(5.0, 20.0)  # Extreme difficulty bonus
+        multiplier *= rng.uniform(5.0, 20.0)  # Extreme difficulty bonus
     if distance > 10.0:
         multiplier *= (distance / 2.0)  # Distance penalty for outer planets
     
@@ -141,17 +738,20 @@ def get_fallback_pricing(product_name, planet_info):
     return {
         'base_price': base_price,
         'multiplier': round(multiplier, 1),
-        'reasoning': random.choice(reasons)
+        'reasoning': rng.choice(reasons)
     }
 
-def get_fallback_description(product_name, planet_name):
+def get_fallback_description(product_name, planet_name, seed=None):
     """
     Fallback product description when AI is unavailable
+
+    Every call counts as a fallback in AI metrics.
     """
+    get_ai_metrics().record_fallback('description')
     descriptions = [
         f"The {product_name} has been specially modified for {planet_name} conditions. Features include radiation shielding, temperature regulation, and a built-in prayer function. Warning: May cause existential crisis when you realize how much you paid for shipping.",
         f"Experience {product_name} like never before - on {planet_name}! This interplanetary edition includes cosmic dust protection and gravity-adjustment features. Side effects may include questioning your life choices and bankruptcy.",
         f"Bringing you {product_name} across the vast emptiness of space to {planet_name}. Enhanced with space-grade materials and hope. Disclaimer: Product may arrive as cosmic dust, but at least you'll have a great story to tell."
     ]
     
-    return random.choice(descriptions)
+    return seeded_random(seed).choice(descriptions)
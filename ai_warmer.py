@@ -0,0 +1,124 @@
+"""
+AI cache warmer driven by search history
+
+Takes the most searched queries per planet from search_history and makes sure
+their AI pricing and descriptions are cached - and will stay cached through the
+next peak - by regenerating anything missing or close to expiry. Gemini calls
+are paced to a rate budget, queue behind interactive traffic at the
+background priority (see rate_limiter) and the run stops early if the circuit
+breaker opens. Run it once, or on a schedule that only works during off-peak hours:
+
+    python ai_warmer.py             # warm now
+    python ai_warmer.py --schedule  # warm every interval, inside SPACEBUY_WARM_HOURS
+"""
+
+import os
+import sys
+import time
+import threading
+from datetime import datetime
+
+from catalog import get_catalog
+from ai_cache import get_ai_cache
+from ai_pricing import pricing_cache_key, description_cache_key, refresh_ai_pricing, refresh_product_description
+from circuit_breaker import gemini_breaker, OPEN
+from rate_limiter import ai_priority, BACKGROUND
+import web_db_utils as db_utils
+
+# Queries warmed per planet, and how far back search history counts
+WARM_TOP_N = int(os.environ.get('SPACEBUY_WARM_TOP_N', 20))
+WARM_LOOKBACK_DAYS = int(os.environ.get('SPACEBUY_WARM_LOOKBACK_DAYS', 7))
+# Gemini calls per minute the warmer may spend
+WARM_RATE_PER_MINUTE = float(os.environ.get('SPACEBUY_WARM_RATE_PER_MINUTE', 30))
+# Entries expiring sooner than this are regenerated
+WARM_REFRESH_SECONDS = float(os.environ.get('SPACEBUY_WARM_REFRESH_SECONDS', 12 * 3600))
+# Off-peak window as "start-end" local hours (end exclusive, may wrap midnight)
+WARM_HOURS = os.environ.get('SPACEBUY_WARM_HOURS', '1-6')
+# Time between scheduled runs
+WARM_INTERVAL_SECONDS = float(os.environ.get('SPACEBUY_WARM_INTERVAL_SECONDS', 3600))
+
+
+def in_off_peak(now=None, hours=WARM_HOURS):
+    """Whether now (default: local time) falls inside the "start-end" hour window"""
+    start, end = (int(hour) for hour in hours.split('-'))
+    hour = (now or datetime.now()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def _needs_refresh(kind, key):
+    remaining = get_ai_cache().expires_in(kind, key)
+    return remaining is None or remaining < WARM_REFRESH_SECONDS
+
+
+def warm_cache(top_n=WARM_TOP_N, days=WARM_LOOKBACK_DAYS, rate_per_minute=WARM_RATE_PER_MINUTE):
+    """
+    Warm the AI cache for the most popular searches; returns run counters
+
+    Each Gemini call waits for its slot in the rate budget, so a run never
+    exceeds rate_per_minute however many entries are stale.
+    """
+    stats = {'searches': 0, 'fresh': 0, 'pricing': 0, 'descriptions': 0, 'failed': 0, 'stopped_early': False}
+    catalog = get_catalog()
+    interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+    next_call = time.monotonic()
+
+    for search in db_utils.get_popular_searches(per_planet=top_n, days=days):
+        product_name, planet_name = search['product_query'], search['target_planet']
+        planet_info = catalog.planet(planet_name)
+        if not product_name or not planet_info:
+            continue
+        stats['searches'] += 1
+
+        jobs = []
+        if _needs_refresh('pricing', pricing_cache_key(product_name, planet_info)):
+            jobs.append(('pricing', refresh_ai_pricing, (product_name, planet_info)))
+        if _needs_refresh('description', description_cache_key(product_name, planet_name)):
+            jobs.append(('descriptions', refresh_product_description, (product_name, planet_name)))
+        if not jobs:
+            stats['fresh'] += 1
+            continue
+
+        for counter, refresh, args in jobs:
+            if gemini_breaker.state == OPEN:
+                # Gemini is struggling; leave it to interactive traffic
+                stats['stopped_early'] = True
+                return stats
+            time.sleep(max(0.0, next_call - time.monotonic()))
+            next_call = max(next_call, time.monotonic()) + interval
+            with ai_priority(BACKGROUND):
+                value = refresh(*args)
+            if value is None:
+                stats['failed'] += 1
+            else:
+                stats[counter] += 1
+    return stats
+
+
+def run_schedule(stop=None):
+    """Warm every WARM_INTERVAL_SECONDS while inside the off-peak window, until stop is set"""
+    stop = stop or threading.Event()
+    last_run = None
+    while not stop.is_set():
+        if in_off_peak() and (last_run is None or time.monotonic() - last_run >= WARM_INTERVAL_SECONDS):
+            last_run = time.monotonic()
+            try:
+                print(f"AI cache warm-up: {warm_cache()}")
+            except Exception as e:
+                print(f"AI cache warm-up error: {e}")
+        stop.wait(60)
+
+
+def start_warmer_thread():
+    """Run the schedule on a daemon thread; returns the Event that stops it"""
+    stop = threading.Event()
+    threading.Thread(target=run_schedule, args=(stop,), name='ai-warmer', daemon=True).start()
+    return stop
+
+
+if __name__ == '__main__':
+    if '--schedule' in sys.argv[1:]:
+        run_schedule()
+    else:
+        print(warm_cache())
@@ -1,8 +1,10 @@
 import streamlit as st
-import pandas as pd
-from data import get_products, get_planets, get_space_agencies, get_planet_exclusive_products
-from ai_pricing import get_ai_pricing, generate_product_description
-from utils import calculate_delivery_cost, format_price, generate_tracking_number, calculate_estimated_delivery_time
+from catalog import get_catalog
+from ai_pricing import get_ai_search_results
+from utils import calculate_delivery_cost, format_price, format_price_cached, generate_tracking_number, calculate_estimated_delivery_time, quote_bucket, quote_seed
+from pricing_engine import price_matrix, compare_prices, format_prices
+from search_index import search_products
+from facets import get_facet_index, PRICE_RANGE_LABELS
 import db_utils
 import random
 import uuid
@@ -50,15 +52,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# One read-only catalog per process, shared by every session (see catalog.get_catalog)
+catalog = get_catalog()
+
+# Refreshed on every rerun so sessions pick up a reloaded catalog file
+st.session_state.products = catalog.products
+st.session_state.planets = catalog.planets
+st.session_state.space_agencies = catalog.space_agencies
+st.session_state.planet_exclusive_products = catalog.exclusive_products
+
 # Initialize session state
-if 'products' not in st.session_state:
-    st.session_state.products = get_products()
-if 'planets' not in st.session_state:
-    st.session_state.planets = get_planets()
-if 'space_agencies' not in st.session_state:
-    st.session_state.space_agencies = get_space_agencies()
-if 'planet_exclusive_products' not in st.session_state:
-    st.session_state.planet_exclusive_products = get_planet_exclusive_products()
 if 'user_session' not in st.session_state:
     st.session_state.user_session = str(uuid.uuid4())
 if 'current_user' not in st.session_state:
@@ -152,38 +155,82 @@ def browse_products():
             st.success("🎉 Congratulations! Please proceed to our Careers section to apply!")
             return
     
+    # Product search
+    search_query = st.text_input("🔎 Search products:", placeholder="Try: iphone, pizza, telescope...")
+    
+    # Facet counts are shown in the filter widgets, so answer the query with
+    # their current values (from session state) before drawing them
+    facets = get_facet_index()
+    pricing_window = quote_bucket()
+    search_order = None
+    within = None
+    if search_query.strip():
+        _, results = search_products(search_query, limit=len(catalog.products), kind='product')
+        search_order = [r['name'] for r in results]
+        within = facets.names_bits(search_order)
+    
+    category_value = st.session_state.get('browse_category', "All")
+    price_value = st.session_state.get('browse_price_range', (PRICE_RANGE_LABELS[0], PRICE_RANGE_LABELS[-1]))
+    agency_value = st.session_state.get('browse_agency', "All")
+    low, high = PRICE_RANGE_LABELS.index(price_value[0]), PRICE_RANGE_LABELS.index(price_value[1])
+    
+    facet_result = facets.query(
+        selected_planet,
+        pricing_window,
+        category=None if category_value == "All" else category_value,
+        price_ranges=PRICE_RANGE_LABELS[low:high + 1],
+        agency=None if agency_value == "All" else agency_value,
+        within=within
+    )
+    counts = facet_result.counts
+    
     # Product filters
     col1, col2, col3 = st.columns(3)
     with col1:
-        category_filter = st.selectbox(
+        st.selectbox(
             "📱 Category:",
-            ["All"] + list(set([p['category'] for p in st.session_state.products]))
+            ("All",) + catalog.categories,
+            key='browse_category',
+            format_func=lambda value: value if value == "All" else f"{value} ({counts['category'][value]})"
         )
     
     with col2:
-        price_range = st.select_slider(
+        st.select_slider(
             "💰 Price Range:",
-            options=["Cheap", "Expensive", "Bankruptcy", "Sell Your Soul"],
-            value="Expensive"
+            options=PRICE_RANGE_LABELS,
+            value=(PRICE_RANGE_LABELS[0], PRICE_RANGE_LABELS[-1]),
+            key='browse_price_range',
+            format_func=lambda value: f"{value} ({counts['price_range'][value]})"
         )
     
     with col3:
-        agency_filter = st.selectbox(
+        st.selectbox(
             "🚀 Space Agency:",
-            ["All"] + list(st.session_state.space_agencies.keys())
+            ("All",) + catalog.agency_names,
+            key='browse_agency',
+            format_func=lambda value: value if value == "All" else f"{value} ({counts['agency'][value]})"
         )
     
     # Filter products
-    filtered_products = st.session_state.products
-    if category_filter != "All":
-        filtered_products = [p for p in filtered_products if p['category'] == category_filter]
+    filtered_products = facet_result.products
+    if search_order is not None:
+        # Keep search relevance order
+        matched = {p['name'] for p in filtered_products}
+        filtered_products = [catalog.product(name) for name in search_order if name in matched]
     
     # Display Earth products
     st.subheader(f"🌍 Earth Products for {selected_planet}")
     st.write("*Shipped from Earth (expensive due to interplanetary logistics)*")
+    if not filtered_products:
+        st.info("🤔 No products match these filters. Try the AI Product Search for anything else!")
     
-    for product in filtered_products:
-        with st.expander(f"{product['emoji']} {product['name']} - {format_price(product['base_price'])}"):
+    # Price the whole filtered catalog for this planet in one vectorized pass;
+    # seeding by pricing window keeps prices stable across reruns
+    planet_info = st.session_state.planets[selected_planet]
+    prices = price_matrix(filtered_products, {selected_planet: planet_info}, bucket=pricing_window)
+    
+    for i, product in enumerate(filtered_products):
+        with st.expander(f"{product['emoji']} {product['name']} - {format_price_cached(product['base_price'])}"):
             col1, col2 = st.columns([2, 1])
             
             with col1:
@@ -191,15 +238,14 @@ def browse_products():
                 st.write(f"**Category:** {product['category']}")
                 
                 # Calculate interplanetary price
-                planet_info = st.session_state.planets[selected_planet]
-                delivery_cost = calculate_delivery_cost(product['base_price'], planet_info)
-                total_price = product['base_price'] + delivery_cost
+                delivery_cost = float(prices.delivery[i, 0])
+                total_price = float(prices.total[i, 0])
                 
                 st.write(f"**Earth Price:** {format_price(product['base_price'])}")
                 st.write(f"**{selected_planet} Price:** {format_price(total_price)}")
                 
                 # Delivery agency
-                agency = random.choice(list(st.session_state.space_agencies.keys()))
+                agency = facets.agency_for(product['name'])
                 agency_info = st.session_state.space_agencies[agency]
                 st.write(f"**Delivery by:** {agency} - {agency_info['motto']}")
                 st.write(f"**Reliability:** {agency_info['reliability']}")
@@ -245,7 +291,7 @@ def browse_products():
         
         exclusive_products = st.session_state.planet_exclusive_products[selected_planet]
         for product in exclusive_products:
-            with st.expander(f"{product['emoji']} {product['name']} - {format_price(product['base_price'])} ⭐ LOCAL"):
+            with st.expander(f"{product['emoji']} {product['name']} - {format_price_cached(product['base_price'])} ⭐ LOCAL"):
                 col1, col2 = st.columns([2, 1])
                 
                 with col1:
@@ -325,10 +371,10 @@ def ai_product_search():
                 return
             
             try:
-                # Get AI-generated product info and pricing
-                product_info = generate_product_description(product_query, target_planet)
+                # Get AI-generated product info and pricing, concurrently under one deadline
                 planet_info = st.session_state.planets[target_planet]
-                ai_price = get_ai_pricing(product_query, planet_info)
+                quote = quote_seed(product_query, target_planet)
+                product_info, ai_price = get_ai_search_results(product_query, target_planet, planet_info, seed=quote)
                 
                 # Add to search history
                 total_ai_price = ai_price['base_price'] * ai_price['multiplier']
@@ -342,7 +388,7 @@ def ai_product_search():
                     st.write(product_info)
                     
                     # Price breakdown
-                    delivery_cost = calculate_delivery_cost(ai_price['base_price'], planet_info)
+                    delivery_cost = calculate_delivery_cost(ai_price['base_price'], planet_info, seed=quote)
                     total_price = ai_price['base_price'] + delivery_cost
                     
                     st.write(f"**Earth Price:** {format_price(ai_price['base_price'])}")
@@ -351,7 +397,7 @@ def ai_product_search():
                     st.write(f"**Reasoning:** {ai_price['reasoning']}")
                 
                 with col2:
-                    agency = random.choice(list(st.session_state.space_agencies.keys()))
+                    agency = random.choice(catalog.agency_names)
                     agency_info = st.session_state.space_agencies[agency]
                     
                     st.info(f"**Delivery by:** {agency}")
@@ -400,7 +446,7 @@ def price_comparison():
     st.write("Compare prices across the galaxy and cry about delivery costs!")
     
     # Product selection
-    product_names = [p['name'] for p in st.session_state.products]
+    product_names = catalog.product_names
     selected_product = st.selectbox("🛍️ Select product:", product_names)
     
     # Planet selection for comparison
@@ -421,60 +467,47 @@ def price_comparison():
     
     if st.button("🚀 Compare Prices Across the Galaxy!"):
         # Find the selected product
-        product = next(p for p in st.session_state.products if p['name'] == selected_product)
+        product = catalog.product(selected_product)
+        
+        # Rank every selected planet numerically in one vectorized pass
+        comparison = compare_prices(
+            product,
+            {planet: st.session_state.planets[planet] for planet in selected_planets},
+            bucket=quote_bucket()
+        )
         
-        # Calculate prices for each planet
         comparison_data = []
-        for planet in selected_planets:
-            planet_info = st.session_state.planets[planet]
-            delivery_cost = calculate_delivery_cost(product['base_price'], planet_info)
-            total_price = product['base_price'] + delivery_cost
-            
+        for entry in comparison['planets']:
+            planet_info = st.session_state.planets[entry['planet']]
             comparison_data.append({
-                'Planet': planet,
-                'Base Price': format_price(product['base_price']),
-                'Delivery Cost': format_price(delivery_cost),
-                'Total Price': format_price(total_price),
+                'Rank': entry['rank'],
+                'Planet': entry['planet'],
+                'Base Price': format_price(comparison['base_price']),
+                'Delivery Cost': format_price(entry['delivery_cost']),
+                'Total Price': format_price(entry['total_price']),
                 'Distance (AU)': planet_info['distance'],
                 'Gravity': f"{planet_info['gravity']}g",
                 'Atmosphere': planet_info['atmosphere']
             })
         
-        # Display comparison table
+        # Display comparison table (pandas loads on first use, not on every cold start)
+        import pandas as pd
         df = pd.DataFrame(comparison_data)
         st.subheader(f"💰 Price Comparison for {selected_product}")
         st.dataframe(df, use_container_width=True)
         
-        # Find cheapest and most expensive (extract numeric values from INR format)
-        prices = []
-        for row in comparison_data:
-            price_str = row['Total Price']
-            # Extract numeric value from various INR formats
-            if 'Cr' in price_str:
-                numeric_part = float(price_str.split('₹')[1].split(' Cr')[0])
-                prices.append(numeric_part * 10_000_000)  # Convert crores to actual INR
-            elif 'L' in price_str:
-                numeric_part = float(price_str.split('₹')[1].split(' L')[0])
-                prices.append(numeric_part * 100_000)  # Convert lakhs to actual INR
-            else:
-                # Regular INR amount
-                numeric_part = float(price_str.replace('₹', '').replace(',', ''))
-                prices.append(numeric_part)
-        cheapest_idx = prices.index(min(prices))
-        expensive_idx = prices.index(max(prices))
+        cheapest = comparison['planets'][0]
+        most_expensive = comparison['planets'][-1]
         
         col1, col2 = st.columns(2)
         with col1:
-            st.success(f"🏆 Cheapest: {comparison_data[cheapest_idx]['Planet']} - {comparison_data[cheapest_idx]['Total Price']}")
+            st.success(f"🏆 Cheapest: {cheapest['planet']} - {format_price(cheapest['total_price'])}")
         with col2:
-            st.error(f"💸 Most Expensive: {comparison_data[expensive_idx]['Planet']} - {comparison_data[expensive_idx]['Total Price']}")
+            st.error(f"💸 Most Expensive: {most_expensive['planet']} - {format_price(most_expensive['total_price'])}")
         
         # Show savings
-        savings = prices[expensive_idx] - prices[cheapest_idx]
-        if savings > 0:
-            # Convert INR savings back to USD equivalent for format_price function
-            savings_usd = savings / 83
-            st.info(f"💡 You could save {format_price(savings_usd)} by choosing {comparison_data[cheapest_idx]['Planet']} over {comparison_data[expensive_idx]['Planet']}!")
+        if comparison['savings'] > 0:
+            st.info(f"💡 You could save {format_price(comparison['savings'])} by choosing {cheapest['planet']} over {most_expensive['planet']}!")
             st.write("*Note: Savings calculated before accounting for the emotional cost of living on an alien planet.*")
 
 def contact_and_careers():
@@ -644,6 +677,7 @@ def show_cost_breakdown(product, planet_info, delivery_cost):
         ]
     }
     
+    import pandas as pd
     df_breakdown = pd.DataFrame(breakdown_data)
     st.dataframe(df_breakdown, use_container_width=True)
 
@@ -699,6 +733,7 @@ def show_ai_cost_breakdown(ai_price, planet_info, delivery_cost, product_name, p
         ]
     }
     
+    import pandas as pd
     df_breakdown = pd.DataFrame(breakdown_data)
     st.dataframe(df_breakdown, use_container_width=True)
 
@@ -743,8 +778,8 @@ def analytics_dashboard():
         # Show detailed table
         st.subheader("📈 Detailed Planet Statistics")
         display_stats = planet_stats.copy()
-        display_stats['total_revenue_inr'] = display_stats['total_revenue_inr'].apply(lambda x: format_price(x / 83))
-        display_stats['avg_order_value'] = display_stats['avg_order_value'].apply(lambda x: format_price(x / 83))
+        display_stats['total_revenue_inr'] = format_prices(display_stats['total_revenue_inr'] / 83)
+        display_stats['avg_order_value'] = format_prices(display_stats['avg_order_value'] / 83)
         st.dataframe(display_stats, use_container_width=True)
     else:
         st.info("📊 No order data available yet. Start placing some orders to see analytics!")
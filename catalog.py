@@ -0,0 +1,339 @@
+"""
+Process-wide, read-only catalog for SpaceBuy
+
+data.py builds fresh literals on every call. The CatalogStore loads them once,
+freezes them and indexes them so request handlers and Streamlit reruns can look
+up products, categories and planets without rebuilding or scanning anything.
+
+When SPACEBUY_CATALOG_PATH points at a catalog database (see export_catalog),
+the store is read from that SQLite file instead of data.py, and is swapped for a
+fresh one whenever the file is replaced - no restart needed. Every worker
+process reads the file into its own store; the file is the single source they
+all reload from, not memory they share.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+from bisect import bisect_right
+from types import MappingProxyType
+from threading import Lock
+
+from data import get_products, get_planets, get_space_agencies, get_planet_exclusive_products
+
+CATALOG_PATH = os.environ.get('SPACEBUY_CATALOG_PATH')
+# How often get_catalog() looks at the file for changes
+CATALOG_CHECK_SECONDS = float(os.environ.get('SPACEBUY_CATALOG_CHECK_SECONDS', 2))
+CATALOG_FORMAT_VERSION = 1
+
+# Column layout of each catalog table, in record field order
+PRODUCT_COLUMNS = (
+    ('name', 'TEXT PRIMARY KEY'),
+    ('emoji', 'TEXT'),
+    ('description', 'TEXT'),
+    ('category', 'TEXT'),
+    ('base_price', 'REAL'),
+)
+EXCLUSIVE_PRODUCT_COLUMNS = PRODUCT_COLUMNS + (
+    ('exclusive_to', 'TEXT'),
+)
+PLANET_COLUMNS = (
+    ('name', 'TEXT PRIMARY KEY'),
+    ('distance', 'REAL'),
+    ('gravity', 'REAL'),
+    ('atmosphere', 'TEXT'),
+    ('delivery_difficulty', 'REAL'),
+    ('population', 'INTEGER'),
+    ('fun_fact', 'TEXT'),
+)
+AGENCY_COLUMNS = (
+    ('name', 'TEXT PRIMARY KEY'),
+    ('motto', 'TEXT'),
+    ('reliability', 'TEXT'),
+    ('delivery_time', 'TEXT'),
+    ('specialty', 'TEXT'),
+)
+PRODUCT_FIELDS = tuple(name for name, _ in PRODUCT_COLUMNS)
+EXCLUSIVE_PRODUCT_FIELDS = tuple(name for name, _ in EXCLUSIVE_PRODUCT_COLUMNS)
+CATALOG_TABLES = (
+    ('products', PRODUCT_COLUMNS),
+    ('exclusive_products', EXCLUSIVE_PRODUCT_COLUMNS),
+    ('planets', PLANET_COLUMNS),
+    ('agencies', AGENCY_COLUMNS),
+)
+
+
+def freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Plain dict/list copy of a frozen value, e.g. for JSON serialization"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def catalog_version(products, planets, space_agencies, exclusive_products):
+    """Content hash of a catalog; changes whenever any record does"""
+    content = json.dumps(
+        [products, planets, space_agencies, exclusive_products],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def export_catalog(path, products=None, planets=None, space_agencies=None, exclusive_products=None):
+    """
+    Write a catalog database (defaults to the data.py catalog).
+
+    The file is built next to its destination and moved into place with
+    os.replace, so readers see either the old catalog or the new one, never a
+    partial write.
+    """
+    products = get_products() if products is None else products
+    planets = get_planets() if planets is None else planets
+    space_agencies = get_space_agencies() if space_agencies is None else space_agencies
+    exclusive_products = get_planet_exclusive_products() if exclusive_products is None else exclusive_products
+
+    rows = {
+        'products': products,
+        'exclusive_products': [p for group in exclusive_products.values() for p in group],
+        'planets': [{'name': name, **info} for name, info in planets.items()],
+        'agencies': [{'name': name, **info} for name, info in space_agencies.items()],
+    }
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        # position keeps catalog order; WITHOUT ROWID keeps the file compact
+        for table, columns in CATALOG_TABLES:
+            definitions = ', '.join(f"{name} {kind}" for name, kind in columns)
+            conn.execute(f"CREATE TABLE {table} (position INTEGER NOT NULL, {definitions}) WITHOUT ROWID")
+            names = [name for name, _ in columns]
+            conn.executemany(
+                f"INSERT INTO {table} (position, {', '.join(names)}) VALUES (?, {', '.join('?' * len(names))})",
+                [(i, *(record[name] for name in names)) for i, record in enumerate(rows[table])]
+            )
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('format_version', str(CATALOG_FORMAT_VERSION)),
+            ('catalog_version', catalog_version(products, planets, space_agencies, exclusive_products)),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(temp_path, path)
+
+
+def read_catalog(path):
+    """
+    Read (products, planets, space_agencies, exclusive_products) from a catalog
+    database, in the same shapes data.py returns.
+
+    The file is opened read-only and closed once the rows are copied out; each
+    process keeps its own frozen copy (and indexes) of the catalog.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if int(meta.get('format_version', 0)) != CATALOG_FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog format: {meta.get('format_version')}")
+
+        tables = {}
+        for table, columns in CATALOG_TABLES:
+            names = [name for name, _ in columns]
+            cursor = conn.execute(f"SELECT {', '.join(names)} FROM {table} ORDER BY position")
+            tables[table] = [dict(zip(names, row)) for row in cursor]
+    finally:
+        conn.close()
+
+    exclusive_products = {}
+    for product in tables['exclusive_products']:
+        exclusive_products.setdefault(product['exclusive_to'], []).append(product)
+    planets = {info.pop('name'): info for info in tables['planets']}
+    space_agencies = {info.pop('name'): info for info in tables['agencies']}
+    return tables['products'], planets, space_agencies, exclusive_products
+
+
+def _group_by(records, field):
+    """Read-only mapping of field value -> tuple of records, in catalog order"""
+    groups = {}
+    for record in records:
+        groups.setdefault(record[field], []).append(record)
+    return MappingProxyType({key: tuple(group) for key, group in groups.items()})
+
+
+class CatalogStore:
+    """
+    Immutable, indexed snapshot of the catalog.
+
+    Records are read-only mappings, so they can be shared between threads and
+    Streamlit sessions; use thaw() to get mutable copies. Lookups by product name,
+    category, planet and exclusive-to-planet are dict lookups, and the category
+    and name lists are computed once.
+    """
+
+    __slots__ = (
+        'version', 'source', 'products', 'planets', 'space_agencies', 'exclusive_products',
+        'all_exclusive_products', 'categories', 'exclusive_categories', 'planet_names', 'agency_names', 'product_names',
+        '_products_by_name', '_products_by_category',
+        '_exclusive_by_name', '_exclusive_by_category',
+        '_product_positions', '_exclusive_positions',
+    )
+
+    def __init__(self, products, planets, space_agencies, exclusive_products, source='data.py'):
+        self.version = catalog_version(products, planets, space_agencies, exclusive_products)
+        self.source = source
+        self.products = freeze(list(products))
+        self.planets = freeze(dict(planets))
+        self.space_agencies = freeze(dict(space_agencies))
+        self.exclusive_products = freeze(dict(exclusive_products))
+
+        exclusive = tuple(
+            product for group in self.exclusive_products.values() for product in group
+        )
+        self.all_exclusive_products = exclusive
+
+        self._products_by_name = MappingProxyType({p['name']: p for p in self.products})
+        self._products_by_category = _group_by(self.products, 'category')
+        self._exclusive_by_name = MappingProxyType({p['name']: p for p in exclusive})
+        self._exclusive_by_category = _group_by(exclusive, 'category')
+        self._product_positions = MappingProxyType({p['name']: i for i, p in enumerate(self.products)})
+        self._exclusive_positions = MappingProxyType({p['name']: i for i, p in enumerate(exclusive)})
+
+        self.categories = tuple(sorted(self._products_by_category))
+        self.exclusive_categories = tuple(sorted(self._exclusive_by_category))
+        self.planet_names = tuple(self.planets)
+        self.agency_names = tuple(self.space_agencies)
+        self.product_names = tuple(self._products_by_name)
+
+    @classmethod
+    def load(cls):
+        """Build a store from the data module"""
+        return cls(get_products(), get_planets(), get_space_agencies(), get_planet_exclusive_products())
+
+    @classmethod
+    def from_file(cls, path):
+        """Build a store from a catalog database written by export_catalog"""
+        products, planets, space_agencies, exclusive_products = read_catalog(path)
+        return cls(products, planets, space_agencies, exclusive_products, source=path)
+
+    def product(self, name):
+        """Earth product by name, or None"""
+        return self._products_by_name.get(name)
+
+    def exclusive_product(self, name):
+        """Planet-exclusive product by name, or None"""
+        return self._exclusive_by_name.get(name)
+
+    def products_in_category(self, category):
+        """Earth products in a category (empty tuple if unknown)"""
+        return self._products_by_category.get(category, ())
+
+    def exclusive_in_category(self, category):
+        """Planet-exclusive products in a category across all planets"""
+        return self._exclusive_by_category.get(category, ())
+
+    def planet(self, name):
+        """Planet info by name, or None"""
+        return self.planets.get(name)
+
+    def exclusive_to(self, planet_name):
+        """Products sold only on a planet (empty tuple if none)"""
+        return self.exclusive_products.get(planet_name, ())
+
+    def agency(self, name):
+        """Space agency info by name, or None"""
+        return self.space_agencies.get(name)
+
+    def product_position(self, name):
+        """Index of an Earth product in catalog order, or None"""
+        return self._product_positions.get(name)
+
+    def page(self, records, after=None, limit=20, exclusive=False):
+        """
+        Keyset pagination over records in catalog order (as every index returns them).
+
+        Returns (up to limit records following the one named after, whether more
+        follow). Paging by name rather than offset keeps a cursor valid across a
+        catalog reload; raises KeyError if after is no longer in the catalog.
+        """
+        positions = self._exclusive_positions if exclusive else self._product_positions
+        start = 0
+        if after is not None:
+            start = bisect_right(records, positions[after], key=lambda record: positions[record['name']])
+        return records[start:start + limit], start + limit < len(records)
+
+
+_store = None
+_store_lock = Lock()
+_file_signature = None
+_next_check = 0.0
+
+
+def _signature(path):
+    """Identity of the file currently at path; os.replace changes the inode"""
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _refresh():
+    """Load or reload the store if it is missing or its file was replaced"""
+    global _store, _file_signature, _next_check
+    _next_check = time.monotonic() + CATALOG_CHECK_SECONDS
+
+    if not CATALOG_PATH:
+        if _store is None:
+            _store = CatalogStore.load()
+        return
+
+    signature = None
+    try:
+        signature = _signature(CATALOG_PATH)
+        if signature != _file_signature:
+            store = CatalogStore.from_file(CATALOG_PATH)
+            # Swap in one assignment; readers hold on to whichever store they got
+            _store, _file_signature = store, signature
+    except (OSError, sqlite3.Error, ValueError) as e:
+        print(f"Catalog load error: {e}")
+        # Don't retry the same broken file on every check, only a replaced one
+        _file_signature = signature
+        if _store is None:
+            _store = CatalogStore.load()
+
+
+def get_catalog():
+    """
+    The process-wide CatalogStore, loaded on first use.
+
+    With SPACEBUY_CATALOG_PATH set, the file is re-checked at most every
+    CATALOG_CHECK_SECONDS and a replaced file yields a new store. A store is never
+    mutated, so callers should fetch it per request rather than keep it forever.
+    If the file cannot be read the last good store (or data.py) keeps serving.
+    """
+    if _store is None or (CATALOG_PATH and time.monotonic() >= _next_check):
+        with _store_lock:
+            if _store is None or (CATALOG_PATH and time.monotonic() >= _next_check):
+                _refresh()
+    return _store
+
+
+if __name__ == '__main__':
+    # python catalog.py [path]: export the data.py catalog to a catalog database
+    target = sys.argv[1] if len(sys.argv) > 1 else (CATALOG_PATH or 'catalog.db')
+    export_catalog(target)
+    print(f"Exported catalog {CatalogStore.from_file(target).version} to {target}")
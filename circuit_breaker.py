@@ -0,0 +1,96 @@
+"""
+Circuit breaker for upstream services (Gemini)
+
+After enough consecutive failures the breaker opens and callers skip the
+upstream call entirely, going straight to their fallback. Once the reset
+timeout has passed it lets a single probe call through (half-open): success
+closes it again, failure re-opens it for another timeout.
+"""
+
+import os
+import time
+import threading
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('SPACEBUY_AI_BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('SPACEBUY_AI_BREAKER_RESET_SECONDS', 30))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Thread-safe consecutive-failure circuit breaker.
+
+    Call allow() before the upstream call and skip it if False; report the
+    outcome with record_success() or record_failure().
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._counters = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def allow(self):
+        """Whether a call may go upstream now"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_started = None
+            if self._state == HALF_OPEN:
+                # One probe at a time; a probe that never reports back times out
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    return True
+            self._counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._counters['successes'] += 1
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._counters['failures'] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._counters['opened'] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def stats(self):
+        """State, consecutive failures and lifetime counters"""
+        state = self.state
+        with self._lock:
+            stats = dict(self._counters)
+            stats['consecutive_failures'] = self._failures
+        stats['state'] = state
+        stats['name'] = self.name
+        return stats
+
+
+# Breaker shared by every Gemini call in this process
+gemini_breaker = CircuitBreaker('gemini')
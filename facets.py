@@ -0,0 +1,173 @@
+"""
+Facet index for browsing the Earth catalog
+
+Every filter value (category, delivery agency, price range on a destination
+planet) has a precomputed bitset over catalog positions, held in a Python int.
+A combination of filters is a handful of integer ANDs, and the count for every
+facet value is a popcount, however large the catalog grows.
+"""
+
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from catalog import get_catalog
+from pricing_engine import price_matrix
+from utils import stable_hash
+
+# Browse price ranges as (label, minimum total price in INR), cheapest first;
+# boundaries follow format_price's tiers (1 Crore, 1000 Crore, 1 Trillion)
+PRICE_RANGES = (
+    ('Cheap', 0),
+    ('Expensive', 10_000_000),
+    ('Bankruptcy', 10_000_000_000),
+    ('Sell Your Soul', 1_000_000_000_000),
+)
+PRICE_RANGE_LABELS = tuple(label for label, _ in PRICE_RANGES)
+# (planet, pricing window) price-range bitsets kept per index; oldest dropped first
+PRICE_BITS_ENTRIES = 64
+
+
+def _bits_from_mask(mask):
+    """Bitset (bit i = position i) of a boolean array"""
+    packed = np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+
+def _positions(bits, size):
+    """Sorted positions of the set bits"""
+    if not bits:
+        return np.empty(0, dtype=np.int64)
+    raw = np.frombuffer(bits.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder='little')[:size])
+
+
+class FacetResult:
+    """Products matching a facet query, in catalog order, plus per-value counts"""
+
+    __slots__ = ('products', 'counts', 'total')
+
+    def __init__(self, products, counts):
+        self.products = products
+        self.counts = counts
+        self.total = len(products)
+
+
+class FacetIndex:
+    """
+    Bitsets over a CatalogStore's Earth products.
+
+    Category and agency bitsets are built once. Price-range bitsets depend on the
+    destination planet and the pricing window, so they are built on first use
+    for each (planet, window) from one vectorized price_matrix pass.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.products = catalog.products
+        self.size = len(self.products)
+        self.all_bits = (1 << self.size) - 1
+
+        # Each product ships with one agency, stable across reruns and processes
+        agencies = catalog.agency_names
+        self.product_agencies = tuple(
+            agencies[stable_hash(product['name']) % len(agencies)] if agencies else None
+            for product in self.products
+        )
+
+        categories = np.array([product['category'] for product in self.products], dtype=object)
+        assigned = np.array(self.product_agencies, dtype=object)
+        self.category_bits = {
+            category: _bits_from_mask(categories == category) for category in catalog.categories
+        }
+        self.agency_bits = {
+            agency: _bits_from_mask(assigned == agency) for agency in agencies
+        }
+        self._agency_by_name = {
+            product['name']: agency for product, agency in zip(self.products, self.product_agencies)
+        }
+        # (planet name, bucket) -> price_bits result, in insertion order
+        self._price_bits = {}
+        self._price_bits_lock = threading.Lock()
+
+    def agency_for(self, product_name):
+        """Delivery agency assigned to an Earth product"""
+        return self._agency_by_name.get(product_name)
+
+    def price_bits(self, planet_name, bucket):
+        """{price range label: bitset} for delivery to a planet in a pricing window"""
+        key = (planet_name, bucket)
+        cached = self._price_bits.get(key)
+        if cached is None:
+            cached = self._build_price_bits(planet_name, bucket)
+            with self._price_bits_lock:
+                self._price_bits[key] = cached
+                while len(self._price_bits) > PRICE_BITS_ENTRIES:
+                    del self._price_bits[next(iter(self._price_bits))]
+        return cached
+
+    def _build_price_bits(self, planet_name, bucket):
+        prices = price_matrix(self.products, {planet_name: self.catalog.planet(planet_name)}, bucket=bucket)
+        inr = prices.total[:, 0] * 83
+        minimums = np.array([minimum for _, minimum in PRICE_RANGES], dtype=np.float64)
+        ranges = np.searchsorted(minimums, inr, side='right') - 1
+        return {label: _bits_from_mask(ranges == i) for i, label in enumerate(PRICE_RANGE_LABELS)}
+
+    def names_bits(self, product_names):
+        """Bitset of the named products (unknown names are ignored)"""
+        bits = 0
+        for name in product_names:
+            position = self.catalog.product_position(name)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+
+    def query(self, planet_name, bucket, category=None, price_ranges=None, agency=None, within=None):
+        """
+        Products matching every given filter, with facet counts.
+
+        price_ranges is a collection of PRICE_RANGES labels (any of them matches);
+        within optionally restricts results to a bitset, e.g. from names_bits for
+        search hits. Counts for each facet apply all the *other* filters, so they
+        show how many products picking that value would yield.
+        """
+        price_bits = self.price_bits(planet_name, bucket)
+        scope = self.all_bits if within is None else within
+
+        category_filter = self.category_bits.get(category, 0) if category else self.all_bits
+        agency_filter = self.agency_bits.get(agency, 0) if agency else self.all_bits
+        price_filter = self.all_bits
+        if price_ranges is not None:
+            price_filter = 0
+            for label in price_ranges:
+                price_filter |= price_bits.get(label, 0)
+
+        counts = {
+            'category': {
+                value: (bits & scope & price_filter & agency_filter).bit_count()
+                for value, bits in self.category_bits.items()
+            },
+            'price_range': {
+                value: (bits & scope & category_filter & agency_filter).bit_count()
+                for value, bits in price_bits.items()
+            },
+            'agency': {
+                value: (bits & scope & category_filter & price_filter).bit_count()
+                for value, bits in self.agency_bits.items()
+            },
+        }
+
+        matches = scope & category_filter & price_filter & agency_filter
+        products = tuple(self.products[i] for i in _positions(matches, self.size).tolist())
+        return FacetResult(products, counts)
+
+
+@lru_cache(maxsize=2)
+def _index_for(catalog):
+    return FacetIndex(catalog)
+
+
+def get_facet_index():
+    """Facet index for the current catalog, rebuilt when the catalog reloads"""
+    return _index_for(get_catalog())
@@ -0,0 +1,78 @@
+"""
+Import-time budget check for SpaceBuy entry points
+
+Imports each entry point in a fresh interpreter with -X importtime and fails
+if it takes longer than the budget, or if it eagerly loads a dependency that
+should only load on first use (the Gemini SDK, pandas). Run it after touching
+module-level imports:
+
+    python import_budget.py [module ...]
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+# Cumulative import time allowed per entry point, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get('SPACEBUY_IMPORT_BUDGET_MS', 400))
+
+# Entry point -> modules that must not be loaded by importing it
+ENTRY_POINTS = {
+    'server': ('google.genai', 'pandas'),
+    'app': ('google.genai', 'pandas'),
+    'ai_pricing': ('google.genai', 'pandas'),
+}
+
+_PROBE = "import sys, json, {module}; print(json.dumps([name for name in {lazy!r} if name in sys.modules]))"
+
+
+def measure_import(module, lazy=()):
+    """
+    Import a module in a fresh interpreter; returns (milliseconds, eagerly
+    loaded lazy modules). Raises RuntimeError if the import fails.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module, lazy=tuple(lazy))],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1])
+    return cumulative / 1000, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check(modules=None, budget_ms=IMPORT_BUDGET_MS):
+    """Print a report for each entry point; returns True if all are within budget"""
+    ok = True
+    for module in modules or ENTRY_POINTS:
+        lazy = ENTRY_POINTS.get(module, ())
+        try:
+            # The first import may compile bytecode; time the second
+            measure_import(module, lazy)
+            elapsed, eager = measure_import(module, lazy)
+        except RuntimeError as e:
+            print(f"{module}: FAILED to import ({e})")
+            ok = False
+            continue
+
+        problems = []
+        if elapsed > budget_ms:
+            problems.append(f"over budget of {budget_ms:.0f} ms")
+        if eager:
+            problems.append(f"eagerly imports {', '.join(eager)}")
+        print(f"{module}: {elapsed:.0f} ms" + (f" - {'; '.join(problems)}" if problems else ""))
+        ok = ok and not problems
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check(sys.argv[1:]) else 1)
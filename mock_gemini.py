@@ -0,0 +1,191 @@
+"""
+Local stand-in for the Gemini API, for load tests and offline benchmarks
+
+Speaks enough of the generateContent / streamGenerateContent REST protocol for
+the genai SDK. JSON prompts get schema-valid pricing (one entry per planet for
+batch prompts, base prices from the catalog), anything else gets a short
+product description, streamed in chunks when asked. Latency, error rate,
+malformed-JSON rate and stream pacing are configurable. Point SpaceBuy at it
+with SPACEBUY_GEMINI_BASE_URL:
+
+    python mock_gemini.py --port 8089 --latency-ms 800 --error-rate 0.02
+    SPACEBUY_GEMINI_BASE_URL=http://127.0.0.1:8089 python server.py
+"""
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from price_classifier import get_price_classifier
+
+_PRODUCT = re.compile(r'"([^"]+)"')
+_BATCH_PLANET = re.compile(r"^\s*- ([^:\n]+): distance", re.MULTILINE)
+# Google API error status names by HTTP status
+_ERROR_STATUS = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE', 504: 'DEADLINE_EXCEEDED'}
+
+
+class MockGemini:
+    """Response generator and fault injection settings for the mock server"""
+
+    def __init__(self, latency_ms=600.0, latency_sigma=0.5, error_rate=0.0, error_status=503,
+                 invalid_rate=0.0, chunks=6, chunk_ms=80.0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.invalid_rate = invalid_rate
+        self.chunks = chunks
+        self.chunk_ms = chunk_ms
+
+    def latency(self, rng):
+        """Seconds until the (first part of the) response: log-normal around latency_ms"""
+        return self.latency_ms / 1000 * math.exp(self.latency_sigma * rng.gauss(0.0, 1.0))
+
+    def pricing(self, product_name, rng):
+        base_price = get_price_classifier().base_price(product_name) * rng.uniform(0.8, 1.2)
+        return {
+            'base_price': round(base_price, 2),
+            'multiplier': round(rng.uniform(50.0, 1000.0), 1),
+            'reasoning': rng.choice([
+                f"Shipping {product_name} past the asteroid belt needs more fuel than a Diwali rocket show",
+                f"Insurance for {product_name} costs more than a Mumbai flat, thanks to cosmic radiation",
+                f"The {product_name} needs gravity-proof packaging, and the packaging needs its own visa",
+            ]),
+        }
+
+    def text(self, prompt, json_response, rng):
+        """Response text for a prompt"""
+        match = _PRODUCT.search(prompt)
+        product_name = match.group(1) if match else 'this product'
+        if json_response and rng.random() < self.invalid_rate:
+            return '{"base_price": '
+        if json_response:
+            planets = _BATCH_PLANET.findall(prompt)
+            if planets:
+                return json.dumps({planet.strip(): self.pricing(product_name, rng) for planet in planets})
+            return json.dumps(self.pricing(product_name, rng))
+        return (
+            f"The {product_name} arrives vacuum-sealed, radiation-hardened and blessed by three mission controllers. "
+            f"It has been tuned for low gravity, so it may float away if you sneeze. "
+            f"Warning: not responsible for existential dread caused by the shipping invoice."
+        )
+
+
+def _response(text, prompt, final=True):
+    """generateContent response body"""
+    body = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}]}
+    if final:
+        body['candidates'][0]['finishReason'] = 'STOP'
+        prompt_tokens, response_tokens = len(prompt) // 4, len(text) // 4
+        body['usageMetadata'] = {
+            'promptTokenCount': prompt_tokens,
+            'candidatesTokenCount': response_tokens,
+            'totalTokenCount': prompt_tokens + response_tokens,
+        }
+    return body
+
+
+def _chunks(text, count):
+    """text split into about count pieces on word boundaries"""
+    words = text.split(' ')
+    size = max(1, math.ceil(len(words) / count))
+    pieces = [' '.join(words[i:i + size]) for i in range(0, len(words), size)]
+    return [piece + ' ' for piece in pieces[:-1]] + pieces[-1:]
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._send_json(400, {'error': {'code': 400, 'message': 'Invalid JSON', 'status': 'INVALID_ARGUMENT'}})
+
+            path = self.path.split('?', 1)[0]
+            if not path.endswith((':generateContent', ':streamGenerateContent')):
+                return self._send_json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+            rng = random.Random()
+            time.sleep(mock.latency(rng))
+            if rng.random() < mock.error_rate:
+                status = mock.error_status
+                return self._send_json(status, {'error': {
+                    'code': status, 'message': 'Injected failure', 'status': _ERROR_STATUS.get(status, 'UNKNOWN')
+                }})
+
+            prompt = ''.join(
+                part.get('text', '') for content in request.get('contents', []) for part in content.get('parts', [])
+            )
+            config = request.get('generationConfig') or {}
+            text = mock.text(prompt, config.get('responseMimeType') == 'application/json', rng)
+
+            if path.endswith(':generateContent'):
+                return self._send_json(200, _response(text, prompt))
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            pieces = _chunks(text, mock.chunks)
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(mock.chunk_ms / 1000)
+                event = json.dumps(_response(piece, prompt, final=i == len(pieces) - 1))
+                self.wfile.write(f"data: {event}\r\n\r\n".encode('utf-8'))
+                self.wfile.flush()
+            self.close_connection = True
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            if self.server.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def serve(mock, host='127.0.0.1', port=8089, verbose=False):
+    """Run the mock server until interrupted"""
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    server.verbose = verbose
+    print(f"Mock Gemini listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=600.0, help='median response latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='log-normal spread of latency (0 = fixed)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected failures')
+    parser.add_argument('--invalid-rate', type=float, default=0.0, help='fraction of JSON responses that are malformed')
+    parser.add_argument('--chunks', type=int, default=6, help='chunks per streamed response')
+    parser.add_argument('--chunk-ms', type=float, default=80.0, help='delay between streamed chunks')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+    serve(
+        MockGemini(args.latency_ms, args.latency_sigma, args.error_rate, args.error_status,
+                   args.invalid_rate, args.chunks, args.chunk_ms),
+        args.host, args.port, args.verbose
+    )
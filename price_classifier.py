@@ -0,0 +1,153 @@
+"""
+Catalog-backed base price estimates for free-text product queries
+
+When Gemini is unavailable, fallback pricing still needs an Earth price for
+whatever the user typed. This compiles every catalog product name, the words in
+those names, the categories and a table of everyday synonyms into one
+Aho-Corasick automaton, so a query is classified in a single pass over its
+characters. Each keyword carries the median catalog price of the products it
+stands for; the most specific keyword found in the query wins.
+"""
+
+from collections import deque
+from functools import lru_cache
+from statistics import median
+
+from ai_cache import normalize_query
+from catalog import get_catalog
+
+# Everyday words for things the catalog sells -> catalog words (from product
+# names or categories) whose products they stand for
+SYNONYMS = {
+    'phone': ('iphone', 'galaxy'),
+    'smartphone': ('iphone', 'galaxy'),
+    'mobile': ('iphone', 'galaxy'),
+    'car': ('tesla', 'nano'),
+    'vehicle': ('vehicles',),
+    'bike': ('enfield',),
+    'motorcycle': ('enfield',),
+    'laptop': ('macbook',),
+    'computer': ('macbook',),
+    'console': ('playstation', 'switch'),
+    'watch': ('rolex',),
+    'drink': ('latte', 'coffee', 'chai'),
+    'tea': ('chai',),
+    'food': ('food beverages',),
+    'noodles': ('ramen', 'maggi'),
+    'shoes': ('jordan',),
+    'sneakers': ('jordan',),
+    'clothes': ('fashion',),
+    'furniture': ('bookshelf', 'chair'),
+    'speaker': ('echo',),
+    'movie': ('bollywood',),
+    'charger': ('power',),
+}
+# Shortest name word used as a keyword on its own
+MIN_KEYWORD_LENGTH = 3
+
+
+class _Automaton:
+    """Aho-Corasick automaton over whole-word patterns"""
+
+    def __init__(self, patterns):
+        # Pad with spaces so patterns only match whole words of the padded text
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for ch in f" {pattern} ":
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(pattern_id)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def matches(self, text):
+        """(pattern id, end position) of every pattern occurring in text"""
+        state = 0
+        for position, ch in enumerate(f" {text} "):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for pattern_id in self.output[state]:
+                yield pattern_id, position
+
+
+class PriceClassifier:
+    """
+    Keyword -> catalog price lookup for product queries.
+
+    Keywords are full product names, single name words, category names and
+    SYNONYMS. A keyword covering fewer products is more specific; ties go to
+    the longer keyword, then the one later in the query (usually the noun:
+    "gaming laptop" is a laptop).
+    """
+
+    def __init__(self, products):
+        prices = [product['base_price'] for product in products]
+        self.default_price = median(prices) if prices else 50.0
+
+        # keyword -> positions of the products it stands for
+        covered = {}
+        for position, product in enumerate(products):
+            name = normalize_query(product['name'])
+            covered.setdefault(name, set()).add(position)
+            covered.setdefault(normalize_query(product['category']), set()).add(position)
+            for word in name.split():
+                if len(word) >= MIN_KEYWORD_LENGTH and not word.isdigit():
+                    covered.setdefault(word, set()).add(position)
+        for synonym, targets in SYNONYMS.items():
+            positions = set().union(*(covered.get(target, ()) for target in targets))
+            if positions:
+                covered.setdefault(synonym, set()).update(positions)
+
+        self.keywords = sorted(covered)
+        self.prices = [median(prices[i] for i in covered[keyword]) for keyword in self.keywords]
+        self.coverage = [len(covered[keyword]) for keyword in self.keywords]
+        self._automaton = _Automaton(self.keywords)
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """Classifier over a CatalogStore's Earth products"""
+        return cls(catalog.products)
+
+    def classify(self, query):
+        """(keyword, base price) for the query's best keyword, or (None, default price)"""
+        best = None
+        for keyword_id, end in self._automaton.matches(normalize_query(query)):
+            rank = (-self.coverage[keyword_id], len(self.keywords[keyword_id]), end)
+            if best is None or rank > best[0]:
+                best = (rank, keyword_id)
+        if best is None:
+            return None, self.default_price
+        return self.keywords[best[1]], self.prices[best[1]]
+
+    def base_price(self, query):
+        """Estimated Earth price in USD for a product query"""
+        return self.classify(query)[1]
+
+
+@lru_cache(maxsize=2)
+def _classifier_for(catalog):
+    return PriceClassifier.from_catalog(catalog)
+
+
+def get_price_classifier():
+    """Price classifier for the current catalog, rebuilt when the catalog reloads"""
+    return _classifier_for(get_catalog())
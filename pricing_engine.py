@@ -0,0 +1,437 @@
+"""
+Vectorized pricing engine for SpaceBuy - prices whole catalogs against every planet in one pass
+"""
+
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from catalog import get_catalog
+from utils import (
+    MARKET_VOLATILITY_RANGE, MIX64_MULTIPLIERS, PRICE_TIERS, SMALL_PRICE_FORMAT,
+    format_price, format_price_cached, get_planet_factors, stable_hash,
+)
+
+# Above this magnitude a double has no representable digits finer than a cent,
+# so round(x, 2) returns x unchanged
+_CENT_EXACT_LIMIT = 2.0 ** 46
+# Dekker splitting constant for exact products in _rint_scaled
+_SPLITTER = 2.0 ** 27 + 1.0
+
+
+class PriceMatrix:
+    """
+    Delivery and total prices for every (product, planet) pair.
+
+    Rows follow product_names and columns follow planet_names. Per-planet factor
+    arrays have shape (planets,), everything else has shape (products, planets).
+    """
+
+    __slots__ = (
+        'product_names', 'planet_names', '_product_index', 'planet_index',
+        'base_price', 'distance_factor', 'gravity_factor', 'difficulty_factor',
+        'atmosphere_factor', 'distance_term', 'gravity_term', 'difficulty_term',
+        'atmosphere_term', 'sun_multiplier', 'distance_penalty',
+        'market_volatility', 'minimum_applied', 'delivery', 'total',
+    )
+
+    def __init__(self, **fields):
+        self._product_index = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def product_index(self):
+        # Built on first lookup; large catalogs are often only read column-wise
+        if self._product_index is None:
+            self._product_index = {name: i for i, name in enumerate(self.product_names)}
+        return self._product_index
+
+    @property
+    def shape(self):
+        return self.delivery.shape
+
+    def breakdown(self, product_name, planet_name):
+        """Return the price and every pricing factor for one cell as plain floats"""
+        i = self.product_index[product_name]
+        j = self.planet_index[planet_name]
+        return {
+            'product': product_name,
+            'planet': planet_name,
+            'base_price': float(self.base_price[i]),
+            'delivery_cost': float(self.delivery[i, j]),
+            'total_price': float(self.total[i, j]),
+            'distance_factor': float(self.distance_factor[j]),
+            'gravity_factor': float(self.gravity_factor[j]),
+            'difficulty_factor': float(self.difficulty_factor[j]),
+            'atmosphere_factor': float(self.atmosphere_factor[j]),
+            'sun_multiplier': float(self.sun_multiplier[j]),
+            'distance_penalty': float(self.distance_penalty[j]),
+            'market_volatility': float(self.market_volatility[i, j]),
+        }
+
+
+_FACTOR_FIELDS = (
+    'distance_factor', 'gravity_factor', 'difficulty_factor', 'atmosphere_factor',
+    'distance_term', 'gravity_term', 'difficulty_term', 'atmosphere_term',
+    'sun_multiplier', 'distance_penalty',
+)
+
+
+@lru_cache(maxsize=64)
+def _factor_table(factors):
+    columns = {}
+    for field in _FACTOR_FIELDS:
+        column = np.array([getattr(f, field) for f in factors], dtype=np.float64)
+        column.setflags(write=False)  # Shared between callers through the cache
+        columns[field] = column
+    return columns
+
+
+def planet_factor_table(planet_infos):
+    """
+    Array-backed view of the compiled PlanetFactors for an ordered list of planets.
+
+    Returns {field: read-only array} for every PlanetFactors field used in pricing.
+    Tables are cached per distinct set of compiled factors.
+    """
+    return _factor_table(tuple(get_planet_factors(info) for info in planet_infos))
+
+
+def _mix64(values):
+    """Vectorized utils.mix64 over a uint64 array (multiplication wraps mod 2**64)"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(MIX64_MULTIPLIERS[0])
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(MIX64_MULTIPLIERS[1])
+    return values ^ (values >> np.uint64(31))
+
+
+def seeded_volatility(product_names, planet_names, bucket):
+    """
+    Market volatility matrix for one pricing window.
+
+    Cell (i, j) equals utils.seeded_uniform(utils.quote_seed(product, planet, bucket), ...)
+    so seeded scalar quotes and seeded matrices agree.
+    """
+    product_keys = np.fromiter((stable_hash(name) for name in product_names),
+                               dtype=np.uint64, count=len(product_names))
+    planet_keys = np.fromiter((stable_hash(name) for name in planet_names),
+                              dtype=np.uint64, count=len(planet_names))
+    planet_keys = _mix64(planet_keys ^ np.uint64(bucket))
+    seeds = _mix64(product_keys[:, None] ^ planet_keys[None, :])
+
+    low, high = MARKET_VOLATILITY_RANGE
+    unit = (_mix64(seeds) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+    return low + (high - low) * unit
+
+
+def _rint_scaled(values, scale):
+    """
+    Round values * scale to the nearest integer, ties to even, judged on the exact
+    product - the rounding Python's round() and %-formatting apply.
+
+    np.rint(values * scale) rounds the product in floating point first, which lands
+    on the wrong side of a half for a few percent of inputs. Here the scaling error
+    of the half-way cells is recovered with an exact (Dekker) product so they are
+    decided on the true value. Returns integer-valued floats.
+    """
+    scaled = values * scale
+    rounded = np.rint(scaled)
+
+    # Only half-way products can round differently; fix those few cells in place
+    remainder = scaled - rounded
+    ties = np.flatnonzero((np.abs(remainder) == 0.5) | (np.abs(scaled) >= 2.0 ** 52))
+    if ties.size:
+        x = values.flat[ties]
+        high = x * _SPLITTER
+        high = high - (high - x)
+        error = (high * scale - scaled.flat[ties]) + (x - high) * scale
+        r = remainder.flat[ties]
+        c = rounded.flat[ties]
+        c = c + ((r == 0.5) & (error > 0)) - ((r == -0.5) & (error < 0))
+        # Above 2**52 the product is an integer and the tie sits in the error term
+        odd = np.fmod(c, 2) != 0
+        c = c + ((error == 0.5) & odd) - ((error == -0.5) & odd)
+        rounded.flat[ties] = c
+
+    return rounded
+
+
+def _round_cents(values):
+    """Round to 2 decimals exactly like Python's round(x, 2)"""
+    unchanged = np.abs(values) >= _CENT_EXACT_LIMIT
+    cents = _rint_scaled(np.where(unchanged, 0.0, values), 100.0)
+    return np.where(unchanged, values, cents / 100.0)
+
+
+def price_matrix(products=None, planets=None, market_volatility=None, rng=None, bucket=None):
+    """
+    Price every product for every planet using vectorized NumPy operations.
+
+    products is a list of product dicts (defaults to the catalog) and planets a
+    dict of planet name to planet info (defaults to the catalog). market_volatility
+    may be a scalar or an array broadcastable to (products, planets). When omitted it
+    is seeded from the pricing window `bucket` (see utils.quote_bucket) if one is
+    given, and otherwise drawn per cell from MARKET_VOLATILITY_RANGE using rng (a
+    NumPy Generator).
+
+    Given the same volatility, each cell matches utils.calculate_delivery_cost; a
+    seeded matrix matches calculate_delivery_cost(..., seed=quote_seed(product,
+    planet, bucket)).
+    """
+    if products is None:
+        products = get_catalog().products
+    if planets is None:
+        planets = get_catalog().planets
+
+    product_names = [p['name'] for p in products]
+    planet_names = list(planets.keys())
+    base_price = np.array([p['base_price'] for p in products], dtype=np.float64)
+    factors = planet_factor_table([planets[name] for name in planet_names])
+
+    shape = (len(product_names), len(planet_names))
+    if market_volatility is None and bucket is not None:
+        market_volatility = seeded_volatility(product_names, planet_names, bucket)
+    elif market_volatility is None:
+        rng = rng if rng is not None else np.random.default_rng()
+        market_volatility = rng.uniform(*MARKET_VOLATILITY_RANGE, size=shape)
+    market_volatility = np.broadcast_to(np.asarray(market_volatility, dtype=np.float64), shape)
+
+    # Multiply in the same order as the scalar formula so every cell is bit-identical
+    delivery = (base_price * 5.0)[:, None] * factors['distance_term']
+    delivery = delivery * factors['gravity_term']
+    delivery = delivery * factors['difficulty_term']
+    delivery = delivery * factors['atmosphere_term']
+    delivery = delivery * market_volatility
+
+    minimum_delivery = (base_price * 10.0)[:, None]
+    minimum_applied = delivery < minimum_delivery
+    delivery = np.maximum(delivery, minimum_delivery)
+    delivery = delivery * factors['sun_multiplier']
+    delivery = delivery * factors['distance_penalty']
+    delivery = _round_cents(delivery)
+
+    return PriceMatrix(
+        product_names=product_names,
+        planet_names=planet_names,
+        planet_index={name: j for j, name in enumerate(planet_names)},
+        base_price=base_price,
+        market_volatility=market_volatility,
+        minimum_applied=minimum_applied,
+        delivery=delivery,
+        total=base_price[:, None] + delivery,
+        distance_factor=factors['distance_factor'],
+        gravity_factor=factors['gravity_factor'],
+        difficulty_factor=factors['difficulty_factor'],
+        atmosphere_factor=factors['atmosphere_factor'],
+        distance_term=factors['distance_term'],
+        gravity_term=factors['gravity_term'],
+        difficulty_term=factors['difficulty_term'],
+        atmosphere_term=factors['atmosphere_term'],
+        sun_multiplier=factors['sun_multiplier'],
+        distance_penalty=factors['distance_penalty'],
+    )
+
+
+def priced_catalog(planet_name, planet_info, products, exclusive_products=(), bucket=None):
+    """
+    Catalog priced for one planet, ready to serialize for the web frontend.
+
+    Earth products carry their delivery cost, total and market volatility; the
+    planet-level factors are shared by every row so they are returned once.
+    Planet-exclusive products are sold locally, so their total is the base price.
+    Display strings come from utils.format_price so clients only render.
+    """
+    prices = price_matrix(products, {planet_name: planet_info}, bucket=bucket)
+    delivery = prices.delivery[:, 0].tolist()
+    total = prices.total[:, 0].tolist()
+    volatility = prices.market_volatility[:, 0].tolist()
+
+    rows = []
+    for i, product in enumerate(products):
+        rows.append({
+            **product,
+            'delivery_cost': delivery[i],
+            'total_price': total[i],
+            'market_volatility': volatility[i],
+            'base_price_display': format_price_cached(product['base_price']),
+            'delivery_cost_display': format_price(delivery[i]),
+            'total_price_display': format_price(total[i]),
+        })
+
+    exclusive_rows = []
+    for product in exclusive_products:
+        exclusive_rows.append({
+            **product,
+            'delivery_cost': 0.0,
+            'total_price': product['base_price'],
+            'base_price_display': format_price_cached(product['base_price']),
+            'delivery_cost_display': format_price(0.0),
+            'total_price_display': format_price_cached(product['base_price']),
+        })
+
+    return {
+        'planet': planet_name,
+        'factors': {
+            name: float(getattr(prices, name)[0])
+            for name in ('distance_factor', 'gravity_factor', 'difficulty_factor',
+                         'atmosphere_factor', 'sun_multiplier', 'distance_penalty')
+        },
+        'products': rows,
+        'exclusive_products': exclusive_rows,
+    }
+
+
+def compare_catalog_prices(products, planets=None, bucket=None):
+    """
+    Compare each product's price across planets using one price matrix.
+
+    Returns one result per product with every planet ranked from cheapest to most
+    expensive, the savings between the extremes (and their price ratio, None when
+    the cheapest total is 0), and each planet's per-factor
+    contributions: the multiplier every term of the delivery formula applies.
+    All values are plain numbers; format them for display at the edge.
+    """
+    if planets is None:
+        planets = get_catalog().planets
+
+    prices = price_matrix(products, planets, bucket=bucket)
+    order = np.argsort(prices.total, axis=1, kind='stable')
+
+    # Per-planet terms are identical for every product, so convert them once
+    planet_terms = {
+        name: getattr(prices, name).tolist()
+        for name in ('distance_term', 'gravity_term', 'difficulty_term', 'atmosphere_term',
+                     'sun_multiplier', 'distance_penalty')
+    }
+
+    results = []
+    for i, product_name in enumerate(prices.product_names):
+        base_price = float(prices.base_price[i])
+        delivery = prices.delivery[i].tolist()
+        total = prices.total[i].tolist()
+        volatility = prices.market_volatility[i].tolist()
+        minimum_applied = prices.minimum_applied[i].tolist()
+
+        ranking = []
+        for rank, j in enumerate(order[i].tolist(), start=1):
+            ranking.append({
+                'planet': prices.planet_names[j],
+                'rank': rank,
+                'delivery_cost': delivery[j],
+                'total_price': total[j],
+                'contributions': {
+                    'base_delivery': base_price * 5.0,
+                    'distance': planet_terms['distance_term'][j],
+                    'gravity': planet_terms['gravity_term'][j],
+                    'difficulty': planet_terms['difficulty_term'][j],
+                    'atmosphere': planet_terms['atmosphere_term'][j],
+                    'market_volatility': volatility[j],
+                    'minimum_applied': minimum_applied[j],
+                    'sun_multiplier': planet_terms['sun_multiplier'][j],
+                    'distance_penalty': planet_terms['distance_penalty'][j],
+                },
+            })
+
+        cheapest, most_expensive = ranking[0], ranking[-1]
+        results.append({
+            'product': product_name,
+            'base_price': base_price,
+            'planets': ranking,
+            'cheapest': cheapest['planet'],
+            'most_expensive': most_expensive['planet'],
+            'savings': most_expensive['total_price'] - cheapest['total_price'],
+            # Undefined for a free product (base price 0 and no minimum fee)
+            'price_ratio': most_expensive['total_price'] / cheapest['total_price'] if cheapest['total_price'] else None,
+        })
+
+    return results
+
+
+def compare_prices(product, planets=None, bucket=None):
+    """
+    Compare one product's price across planets (see compare_catalog_prices)
+    """
+    return compare_catalog_prices([product], planets, bucket=bucket)[0]
+
+
+# PRICE_TIERS minimums in ascending order, for binning with searchsorted
+_TIER_MINIMUMS = np.array([tier[0] for tier in reversed(PRICE_TIERS)], dtype=np.float64)
+
+
+def _fixed_point_strings(values, decimals):
+    """Vectorized format(value, f'.{decimals}f') for finite, non-negative values"""
+    digits = _rint_scaled(values, 10.0 ** decimals).astype(np.int64)
+    if decimals == 0:
+        return digits.astype(str)
+    whole, fraction = np.divmod(digits, 10 ** decimals)
+    return np.strings.add(
+        np.strings.add(whole.astype(str), '.'),
+        np.strings.zfill(fraction.astype(str), decimals)
+    )
+
+
+def _format_tier(scaled, number_format):
+    """Format one tier's scaled values the way format(value, number_format) would"""
+    grouped = number_format.startswith(',')
+    decimals = int(number_format.rstrip('f').rsplit('.', 1)[1])
+
+    # The string fast path covers finite values without a sign bit whose rounded digits
+    # stay exact in a double, grouped only below a million (a single separator)
+    limit = 1e6 - 0.5 if grouped else 2.0 ** 52 / 10 ** decimals
+    fast = np.isfinite(scaled) & ~np.signbit(scaled) & (scaled < limit)
+
+    numbers = np.empty(scaled.shape, dtype=object)
+    if fast.any():
+        strings = _fixed_point_strings(scaled[fast], decimals)
+        if grouped:
+            whole, dot, fraction = np.strings.partition(strings, '.')
+            thousands = np.strings.slice(whole, 0, -3)
+            whole = np.where(
+                np.strings.str_len(whole) > 3,
+                np.strings.add(np.strings.add(thousands, ','), np.strings.slice(whole, -3, None)),
+                whole
+            )
+            strings = np.strings.add(np.strings.add(whole, dot), fraction)
+        numbers[fast] = strings
+    if not fast.all():
+        numbers[~fast] = [format(value, number_format) for value in scaled[~fast].tolist()]
+    return numbers
+
+
+def format_prices(prices):
+    """
+    Vectorized utils.format_price for whole columns of USD prices.
+
+    Accepts a pandas Series, NumPy array or any sequence and returns exactly the
+    strings format_price would: a Series with the original index for Series input,
+    otherwise an object array of the input's shape. Each distinct value is formatted
+    once, values are binned into PRICE_TIERS with a single searchsorted, and each
+    tier's digits are produced with integer arithmetic rather than per-value calls.
+    """
+    values = np.asarray(prices, dtype=np.float64)
+    # Deduplicate on the bit patterns so -0.0 keeps its own '₹-0.00'
+    unique, inverse = np.unique(values.ravel().view(np.int64), return_inverse=True)
+    unique = unique.view(np.float64)
+
+    inr = unique * 83
+    tiers = np.searchsorted(_TIER_MINIMUMS, inr, side='right')  # 0 = below every tier
+    tiers[np.isnan(inr)] = 0
+
+    formatted = np.empty(unique.shape, dtype=object)
+    for tier in np.unique(tiers).tolist():
+        mask = tiers == tier
+        if tier == 0:
+            divisor, number_format, label = 1, SMALL_PRICE_FORMAT, ''
+        else:
+            _, divisor, number_format, label = PRICE_TIERS[len(PRICE_TIERS) - tier]
+        numbers = _format_tier(inr[mask] / divisor, number_format)
+        formatted[mask] = '₹' + numbers + label
+
+    result = formatted[inverse].reshape(values.shape)
+
+    # Only Series inputs need pandas, and those imply it is already imported
+    pandas = sys.modules.get('pandas')
+    if pandas is not None and isinstance(prices, pandas.Series):
+        return pandas.Series(result, index=prices.index, name=prices.name)
+    return result
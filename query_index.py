@@ -0,0 +1,287 @@
+"""
+Near-duplicate matching for AI queries
+
+"iphone 15", "iPhone15 Pro" and "i phone 15 pro max" are different cache keys
+but deserve the same AI price. This index remembers the queries that have a
+cached AI result, grouped by scope (for pricing, the planet), and finds the
+closest past query by character-trigram Jaccard similarity of the normalized
+query with its spaces removed. Queries with different numbers in them
+("iphone 14" / "iphone 15") never match, and neither do queries that differ by
+more than spacing, a small typo or model-variant words like "pro" and "max":
+"iphone 15 case" and "tesla model s toy" are different products however many
+trigrams they share. Entries live in the AI cache's SQLite
+file, so every worker process and restart shares them.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+
+from ai_cache import AI_CACHE_PATH, normalize_query
+from search_index import trigrams
+
+# Jaccard similarity a past query needs to be reused; above 1 disables matching
+SIMILAR_QUERY_THRESHOLD = float(os.environ.get('SPACEBUY_SIMILAR_QUERY_THRESHOLD', 0.25))
+# Most remembered queries; the oldest are forgotten first
+SIMILAR_QUERY_MAX_ENTRIES = int(os.environ.get('SPACEBUY_SIMILAR_QUERY_MAX_ENTRIES', 100_000))
+
+# Words that name a variant of the same product; queries may differ by these
+VARIANT_WORDS = frozenset({
+    'pro', 'max', 'plus', 'mini', 'ultra', 'lite', 'se', 'fe', 'new', 'latest',
+    'edition', 'version', 'gen', 'generation', 'original', 'official', 'standard',
+})
+# Largest typo (characters inserted, removed or changed) two queries may differ by,
+# and the shortest word a typo may fall in
+MAX_TYPO_CHARS = 2
+MIN_TYPO_WORD_LENGTH = 4
+
+_NUMBERS = re.compile(r"\d+")
+
+
+def query_signature(query):
+    """(trigrams, numbers) a query is compared by, or None if it has no words"""
+    normalized = normalize_query(query)
+    compact = normalized.replace(' ', '')
+    if not compact:
+        return None
+    return frozenset(trigrams(compact)), tuple(_NUMBERS.findall(normalized))
+
+
+def _words(normalized):
+    """(compact form, [(start, end, word)] of each word in the compact form)"""
+    spans, start = [], 0
+    for word in normalized.split():
+        spans.append((start, start + len(word), word))
+        start += len(word)
+    return normalized.replace(' ', ''), spans
+
+
+def _touched(spans, start, end):
+    """Words overlapping compact range [start, end), or containing position start if empty"""
+    if start == end:
+        return [word for word_start, word_end, word in spans if word_start < start < word_end]
+    return [word for word_start, word_end, word in spans if word_start < end and start < word_end]
+
+
+def same_product(query, other):
+    """
+    Whether two normalized queries differ only by spacing, one small typo
+    and added or removed VARIANT_WORDS
+    """
+    compact, spans = _words(query)
+    other_compact, other_spans = _words(other)
+    typo_chars = 0
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, compact, other_compact, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            continue
+        words = _touched(spans, i1, i2) + _touched(other_spans, j1, j2)
+        if tag != 'replace' and words and all(word in VARIANT_WORDS for word in words):
+            # Whole variant words present on one side only
+            continue
+        typo_chars += max(i2 - i1, j2 - j1)
+        if typo_chars > MAX_TYPO_CHARS or not words or min(map(len, words)) < MIN_TYPO_WORD_LENGTH:
+            return False
+    return True
+
+
+class _Scope:
+    """Remembered queries of one (kind, scope) with a trigram inverted index"""
+
+    __slots__ = ('queries', 'postings')
+
+    def __init__(self):
+        # normalized query -> (cache key, trigrams, numbers)
+        self.queries = {}
+        self.postings = {}
+
+    def add(self, query, key, grams, numbers):
+        self.discard(query)
+        self.queries[query] = (key, grams, numbers)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(query)
+
+    def discard(self, query):
+        entry = self.queries.pop(query, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            holders = self.postings.get(gram)
+            if holders is not None:
+                holders.discard(query)
+                if not holders:
+                    del self.postings[gram]
+
+
+class QueryIndex:
+    """
+    Remembered AI queries, searchable by similarity.
+
+    add() records that a query's result is cached under a key; find() returns
+    the most similar remembered query in the same kind and scope and its key,
+    if it clears the threshold and names the same product (see same_product). Callers should discard() a matched query whose
+    cache entry has gone, so it stops shadowing other matches.
+    """
+
+    def __init__(self, path=AI_CACHE_PATH, threshold=SIMILAR_QUERY_THRESHOLD, max_entries=SIMILAR_QUERY_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._scopes = {}
+        # (kind, scope, query) -> row id, oldest first
+        self._ids = OrderedDict()
+        self._last_id = 0
+        self._initialized = False
+        self._counters = {'lookups': 0, 'matches': 0, 'stale': 0}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if not self._initialized:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS ai_queries (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        kind TEXT NOT NULL,
+                        scope TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        UNIQUE (kind, scope, query)
+                    )
+                """)
+                self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, row_id, kind, scope, query, key):
+        """Add a row to the in-memory index (caller holds the lock)"""
+        signature = query_signature(query)
+        if signature is None:
+            return
+        self._scopes.setdefault((kind, scope), _Scope()).add(query, key, *signature)
+        self._ids.pop((kind, scope, query), None)
+        self._ids[(kind, scope, query)] = row_id
+        while len(self._ids) > self.max_entries:
+            (old_kind, old_scope, old_query), _ = self._ids.popitem(last=False)
+            self._scopes[(old_kind, old_scope)].discard(old_query)
+
+    def _sync(self):
+        """Pick up queries other processes added since the last sync"""
+        try:
+            rows = self._connection().execute(
+                "SELECT id, kind, scope, query, key FROM ai_queries WHERE id > ? ORDER BY id", (self._last_id,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Query index read error: {e}")
+            return
+        if not rows:
+            return
+        with self._lock:
+            for row_id, kind, scope, query, key in rows:
+                self._remember(row_id, kind, scope, query, key)
+                self._last_id = max(self._last_id, row_id)
+
+    def find(self, kind, scope, query):
+        """(remembered query, cache key) of the most similar remembered query, or None"""
+        signature = query_signature(query)
+        if signature is None or self.threshold > 1:
+            return None
+        grams, numbers = signature
+        normalized = normalize_query(query)
+        self._sync()
+
+        with self._lock:
+            self._counters['lookups'] += 1
+            entries = self._scopes.get((kind, scope))
+            if entries is None:
+                return None
+            if normalized in entries.queries:
+                self._counters['matches'] += 1
+                return normalized, entries.queries[normalized][0]
+
+            shared = Counter()
+            for gram in grams:
+                shared.update(entries.postings.get(gram, ()))
+            candidates = []
+            for candidate, overlap in shared.items():
+                key, candidate_grams, candidate_numbers = entries.queries[candidate]
+                if candidate_numbers != numbers:
+                    continue
+                similarity = overlap / (len(grams) + len(candidate_grams) - overlap)
+                if similarity >= self.threshold:
+                    candidates.append((similarity, candidate, key))
+            for _, candidate, key in sorted(candidates, reverse=True):
+                if same_product(normalized, candidate):
+                    self._counters['matches'] += 1
+                    return candidate, key
+            return None
+
+    def add(self, kind, scope, query, key):
+        """Remember that query's result is cached under key"""
+        normalized = normalize_query(query)
+        with self._lock:
+            entries = self._scopes.get((kind, scope))
+            if entries is not None and entries.queries.get(normalized, (None,))[0] == key:
+                return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM ai_queries WHERE kind = ? AND scope = ? AND query = ?", (kind, scope, normalized))
+                row_id = conn.execute(
+                    "INSERT INTO ai_queries (kind, scope, query, key) VALUES (?, ?, ?, ?)", (kind, scope, normalized, key)
+                ).lastrowid
+                conn.execute("DELETE FROM ai_queries WHERE id <= ?", (row_id - self.max_entries,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Query index write error: {e}")
+            return
+        with self._lock:
+            self._remember(row_id, kind, scope, normalized, key)
+
+    def discard(self, kind, scope, query):
+        """Forget a query, e.g. because its cache entry expired"""
+        normalized = normalize_query(query)
+        with self._lock:
+            self._counters['stale'] += 1
+            entries = self._scopes.get((kind, scope))
+            if entries is not None:
+                entries.discard(normalized)
+            self._ids.pop((kind, scope, normalized), None)
+        try:
+            self._connection().execute(
+                "DELETE FROM ai_queries WHERE kind = ? AND scope = ? AND query = ?", (kind, scope, normalized)
+            )
+        except sqlite3.Error as e:
+            print(f"Query index write error: {e}")
+
+    def stats(self):
+        """Lookup/match counters and the number of remembered queries"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._ids)
+        stats['threshold'] = self.threshold
+        return stats
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_query_index():
+    """The process-wide QueryIndex, configured from SPACEBUY_SIMILAR_QUERY_* variables"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = QueryIndex()
+    return _index
@@ -0,0 +1,192 @@
+"""
+Priority token-bucket rate limiter for outbound Gemini requests
+
+Every Gemini call takes a token first. Tokens refill at a steady rate up to a
+burst size; when they run out, callers queue and are served strictly by
+priority class (interactive before batch before background), first come first
+served within a class. Interactive and batch callers give up after a timeout
+and take their fallback; background work waits as long as it takes.
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from ai_metrics import get_ai_metrics
+
+GEMINI_RATE_PER_SECOND = float(os.environ.get('SPACEBUY_GEMINI_RATE_PER_SECOND', 5))
+GEMINI_BURST = float(os.environ.get('SPACEBUY_GEMINI_BURST', 10))
+# Longest an interactive or batch call queues for a token; background calls wait indefinitely
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('SPACEBUY_GEMINI_QUEUE_TIMEOUT_SECONDS', 10))
+
+# Priority classes, most urgent first
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = ('interactive', 'batch', 'background')
+
+_priority = contextvars.ContextVar('ai_priority', default=INTERACTIVE)
+# One-item list: whether the current context holds a reserved, unused token
+_reservation = contextvars.ContextVar('ai_reservation', default=None)
+
+
+def current_priority():
+    """Priority class of Gemini calls made from the current context"""
+    return _priority.get()
+
+
+@contextmanager
+def ai_priority(priority):
+    """Run Gemini calls inside the block at the given priority class"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimited(Exception):
+    """No rate limit token became available before the caller's queue timeout"""
+
+
+class PriorityRateLimiter:
+    """
+    Token bucket shared by all callers, with a priority queue of waiters.
+
+    acquire() returns True once the caller holds a token, or False if its
+    timeout passed first. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate=GEMINI_RATE_PER_SECOND, burst=GEMINI_BURST):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        # Heap of (priority, arrival) tickets; only the head may take a token
+        self._waiting = []
+        self._arrivals = itertools.count()
+        self._counters = [
+            {'acquired': 0, 'timeouts': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0} for _ in PRIORITY_NAMES
+        ]
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _depth(self, priority):
+        return sum(1 for ticket_priority, _ in self._waiting if ticket_priority == priority)
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        if self.rate <= 0:
+            return True
+
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        metrics = get_ai_metrics()
+        name = PRIORITY_NAMES[priority]
+        with self._cond:
+            ticket = (priority, next(self._arrivals))
+            heapq.heappush(self._waiting, ticket)
+            metrics.set_gauge('spacebuy_ai_queue_depth', self._depth(priority), priority=name)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    at_head = self._waiting[0] == ticket
+                    if at_head and self._tokens >= 1:
+                        self._tokens -= 1
+                        acquired = True
+                        break
+                    if deadline is not None and now >= deadline:
+                        acquired = False
+                        break
+                    # The head sleeps until its token is due; the rest until the head moves
+                    waits = [w for w in (
+                        (1 - self._tokens) / self.rate if at_head else None,
+                        None if deadline is None else deadline - now,
+                    ) if w is not None]
+                    self._cond.wait(min(waits) if waits else None)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                metrics.set_gauge('spacebuy_ai_queue_depth', self._depth(priority), priority=name)
+
+            waited = time.monotonic() - started
+            counters = self._counters[priority]
+            counters['acquired' if acquired else 'timeouts'] += 1
+            counters['wait_seconds'] += waited
+            counters['max_wait_seconds'] = max(counters['max_wait_seconds'], waited)
+
+        metrics.observe('spacebuy_ai_queue_wait_seconds', waited, priority=name)
+        if not acquired:
+            metrics.inc('spacebuy_ai_throttled_total', priority=name)
+        return acquired
+
+    def acquire_or_raise(self, priority=None):
+        """
+        acquire() with the class's queue timeout (none for background work);
+        priority defaults to current_priority(). Raises RateLimited on timeout.
+        Inside reserved(), the first call takes the reserved token instead.
+        """
+        reservation = _reservation.get()
+        if reservation is not None and reservation[0]:
+            reservation[0] = False
+            return
+        priority = current_priority() if priority is None else priority
+        timeout = None if priority == BACKGROUND else GEMINI_QUEUE_TIMEOUT_SECONDS
+        if not self.acquire(priority, timeout):
+            raise RateLimited(f"no Gemini {PRIORITY_NAMES[priority]} slot within {timeout:g}s")
+
+    def release(self):
+        """Put back a token that was acquired but not used"""
+        if self.rate <= 0:
+            return
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = min(self.burst, self._tokens + 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserved(self, priority=None):
+        """
+        Hold a token for the first Gemini call made inside the block
+
+        The token is queued for up front (acquire_or_raise, so this may raise
+        RateLimited), before the block starts work other callers wait on - such
+        as leading a single-flight call - so they never wait behind this
+        caller's place in the queue. An unused token is put back on exit.
+        """
+        self.acquire_or_raise(priority)
+        reservation = [True]
+        token = _reservation.set(reservation)
+        try:
+            yield
+        finally:
+            _reservation.reset(token)
+            if reservation[0]:
+                self.release()
+
+    def stats(self):
+        """Configured rate, available tokens and per-class queue depth and wait times"""
+        with self._cond:
+            self._refill(time.monotonic())
+            classes = {}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                counters = dict(self._counters[priority])
+                requests = counters['acquired'] + counters['timeouts']
+                wait_seconds = counters.pop('wait_seconds')
+                counters['mean_wait_seconds'] = wait_seconds / requests if requests else 0.0
+                counters['queue_depth'] = self._depth(priority)
+                classes[name] = counters
+            return {'rate_per_second': self.rate, 'burst': self.burst, 'tokens': self._tokens, 'classes': classes}
+
+
+# Limiter shared by every Gemini call in this process
+gemini_limiter = PriorityRateLimiter()
@@ -0,0 +1,231 @@
+"""
+Full-text product search for SpaceBuy
+
+An inverted index over the catalog (Earth products and planet exclusives) with
+field-weighted BM25 ranking, prefix matching for partially typed words and
+trigram-based typo tolerance. Postings are NumPy arrays, so a query touches only
+the terms it expands to and scores them with a handful of vectorized operations.
+"""
+
+import re
+import math
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+
+import numpy as np
+
+from catalog import get_catalog, thaw
+
+# Relative weight of a word depending on where it appears
+FIELD_WEIGHTS = (
+    ('name', 3.0),
+    ('category', 2.0),
+    ('exclusive_to', 1.5),
+    ('description', 1.0),
+)
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Score multipliers for the ways a query word can match an indexed term
+PREFIX_MATCH_WEIGHT = 0.8
+FUZZY_MATCH_WEIGHT = 0.6
+# Shortest query word that is expanded as a prefix / corrected for typos
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+# Most indexed terms a single query word may expand to
+MAX_PREFIX_EXPANSIONS = 32
+MAX_FUZZY_EXPANSIONS = 8
+# Trigram Jaccard similarity a term needs to count as a typo of the query word
+FUZZY_THRESHOLD = 0.35
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens of text"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_PATTERN.findall(text)
+
+
+def trigrams(term):
+    """Character trigrams of a term, padded so word boundaries count"""
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted index over a list of product records.
+
+    Each term maps to a postings pair (document ids, BM25 weights) computed at
+    build time; vocabulary is kept sorted for prefix lookups and indexed by
+    trigram for typo tolerance. Instances are immutable once built.
+    """
+
+    def __init__(self, documents, kinds):
+        self.documents = documents
+        self.kinds = np.asarray(kinds, dtype=object)
+
+        term_weights = {}
+        lengths = np.zeros(len(documents), dtype=np.float64)
+        for doc_id, document in enumerate(documents):
+            weights = {}
+            for field, field_weight in FIELD_WEIGHTS:
+                value = document.get(field)
+                if not value:
+                    continue
+                for token in tokenize(value):
+                    weights[token] = weights.get(token, 0.0) + field_weight
+                    lengths[doc_id] += field_weight
+            for token, weight in weights.items():
+                term_weights.setdefault(token, []).append((doc_id, weight))
+
+        average_length = lengths.mean() if len(documents) else 1.0
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (average_length or 1.0))
+
+        self.vocabulary = sorted(term_weights)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.postings = []
+        document_frequency = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for term_id, term in enumerate(self.vocabulary):
+            entries = term_weights[term]
+            doc_ids = np.fromiter((doc_id for doc_id, _ in entries), dtype=np.int64, count=len(entries))
+            tf = np.fromiter((weight for _, weight in entries), dtype=np.float64, count=len(entries))
+            idf = math.log(1 + (len(documents) - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings.append((doc_ids, idf * tf * (BM25_K1 + 1) / (tf + norms[doc_ids])))
+            document_frequency[term_id] = len(entries)
+        self.document_frequency = document_frequency
+
+        # trigram -> ids of vocabulary terms containing it
+        grams = {}
+        self.trigram_counts = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for term_id, term in enumerate(self.vocabulary):
+            term_grams = trigrams(term)
+            self.trigram_counts[term_id] = len(term_grams)
+            for gram in term_grams:
+                grams.setdefault(gram, []).append(term_id)
+        self.trigram_index = {gram: np.array(ids, dtype=np.int64) for gram, ids in grams.items()}
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """Index a CatalogStore's Earth products and planet exclusives"""
+        documents = list(catalog.products)
+        kinds = ['product'] * len(documents)
+        for group in catalog.exclusive_products.values():
+            documents.extend(group)
+            kinds.extend(['exclusive'] * len(group))
+        return cls(documents, kinds)
+
+    def _prefix_terms(self, token):
+        """Ids of vocabulary terms starting with token, most common first if capped"""
+        start = bisect_left(self.vocabulary, token)
+        end = bisect_left(self.vocabulary, token + '\U0010ffff', lo=start)
+        if end - start <= MAX_PREFIX_EXPANSIONS:
+            return range(start, end)
+        frequent = np.argpartition(-self.document_frequency[start:end], MAX_PREFIX_EXPANSIONS)
+        return (start + frequent[:MAX_PREFIX_EXPANSIONS]).tolist()
+
+    def _fuzzy_terms(self, token):
+        """(term id, similarity) of vocabulary terms within typo distance of token"""
+        token_grams = trigrams(token)
+        candidates = [self.trigram_index[gram] for gram in token_grams if gram in self.trigram_index]
+        if not candidates:
+            return []
+        term_ids, shared = np.unique(np.concatenate(candidates), return_counts=True)
+        similarity = shared / (len(token_grams) + self.trigram_counts[term_ids] - shared)
+        keep = np.flatnonzero(similarity >= FUZZY_THRESHOLD)
+        if keep.size > MAX_FUZZY_EXPANSIONS:
+            keep = keep[np.argpartition(-similarity[keep], MAX_FUZZY_EXPANSIONS)[:MAX_FUZZY_EXPANSIONS]]
+        return list(zip(term_ids[keep].tolist(), similarity[keep].tolist()))
+
+    def expand(self, token):
+        """Indexed terms a query word matches, as {term id: match weight}"""
+        matches = {}
+        term_id = self.term_ids.get(token)
+        if term_id is not None:
+            matches[term_id] = 1.0
+        if len(token) >= MIN_PREFIX_LENGTH:
+            for prefix_id in self._prefix_terms(token):
+                matches.setdefault(prefix_id, PREFIX_MATCH_WEIGHT)
+        # Only correct words that are not in the vocabulary as typed
+        if term_id is None and len(token) >= MIN_FUZZY_LENGTH:
+            for fuzzy_id, similarity in self._fuzzy_terms(token):
+                matches.setdefault(fuzzy_id, FUZZY_MATCH_WEIGHT * similarity)
+        return matches
+
+    def search(self, query, limit=20, kind=None):
+        """
+        Rank documents for a free-text query.
+
+        Documents matching more query words always rank above ones matching
+        fewer; within that, by summed BM25 score, where each query word counts
+        its best exact, prefix or typo-corrected match. kind restricts results to
+        'product' or 'exclusive'. Returns (total matches, [(document, kind, score)]).
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.documents:
+            return 0, []
+
+        # Per query word, each document keeps its best-matching expansion
+        word_doc_ids, word_scores = [], []
+        for token in tokens:
+            expansions = self.expand(token)
+            if not expansions:
+                continue
+            doc_ids = np.concatenate([self.postings[term_id][0] for term_id in expansions])
+            scores = np.concatenate([
+                self.postings[term_id][1] * weight for term_id, weight in expansions.items()
+            ])
+            order = np.lexsort((-scores, doc_ids))
+            doc_ids, scores = doc_ids[order], scores[order]
+            first = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+            word_doc_ids.append(doc_ids[first])
+            word_scores.append(scores[first])
+        if not word_doc_ids:
+            return 0, []
+
+        # Sum the words' scores per document and count how many words matched
+        candidates, inverse = np.unique(np.concatenate(word_doc_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(word_scores))
+        matched = np.bincount(inverse)
+        if kind is not None:
+            keep = self.kinds[candidates] == kind
+            candidates, scores, matched = candidates[keep], scores[keep], matched[keep]
+        if not candidates.size:
+            return 0, []
+
+        # Rank by words matched, then score; only the top `limit` get sorted
+        rank = matched * (scores.max() + 1) + scores
+        if candidates.size > limit:
+            top = np.argpartition(-rank, limit - 1)[:limit]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-rank[top], kind='stable')]
+        return int(candidates.size), [
+            (self.documents[i], str(self.kinds[i]), score)
+            for i, score in zip(candidates[top].tolist(), scores[top].tolist())
+        ]
+
+
+@lru_cache(maxsize=2)
+def _index_for(catalog):
+    return SearchIndex.from_catalog(catalog)
+
+
+def get_search_index():
+    """Search index for the current catalog, rebuilt when the catalog reloads"""
+    return _index_for(get_catalog())
+
+
+def search_products(query, limit=20, kind=None):
+    """
+    Search the current catalog; returns (total matches, results) where each
+    result is a plain product dict with 'kind' and 'score' added.
+    """
+    total, hits = get_search_index().search(query, limit=limit, kind=kind)
+    return total, [
+        {**thaw(document), 'kind': document_kind, 'score': round(score, 4)}
+        for document, document_kind, score in hits
+    ]
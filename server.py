@@ -4,17 +4,30 @@ SpaceBuy Web Server - Flask Backend API
 Serves the HTML/CSS/JS frontend and provides API endpoints
 """
 
-from flask import Flask, jsonify, request, send_from_directory, send_file
+from flask import Flask, Response, jsonify, request, send_from_directory, send_file, stream_with_context
 import os
 import json
+import time
 import uuid
+import base64
+import gzip
+import brotli
+import hashlib
 from datetime import datetime
-import random
+from functools import lru_cache
 
 # Import existing modules
-from data import get_products, get_planets, get_space_agencies, get_planet_exclusive_products
-from ai_pricing import get_ai_pricing, generate_product_description
-from utils import calculate_delivery_cost, format_price, generate_tracking_number, calculate_estimated_delivery_time
+from catalog import get_catalog, thaw, PRODUCT_FIELDS, EXCLUSIVE_PRODUCT_FIELDS
+from ai_pricing import get_ai_search_results, get_batch_ai_pricing, stream_ai_search
+from ai_cache import get_ai_cache
+from singleflight import get_singleflight
+from circuit_breaker import gemini_breaker
+from query_index import get_query_index
+from ai_metrics import get_ai_metrics
+from rate_limiter import gemini_limiter
+from utils import calculate_delivery_cost, format_price, generate_tracking_number, calculate_estimated_delivery_time, quote_seed, seeded_random, quote_bucket, QUOTE_WINDOW_SECONDS
+from pricing_engine import priced_catalog, compare_catalog_prices
+from search_index import search_products
 import web_db_utils as db_utils
 
 app = Flask(__name__)
@@ -23,6 +36,16 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'space-buy-secret-key')
 # Ensure static directory exists
 os.makedirs('static', exist_ok=True)
 
+# Page sizes for the paginated catalog endpoints
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Any of these switches a catalog endpoint from the full dump to a page
+PAGE_PARAMS = ('cursor', 'limit', 'fields', 'category', 'planet')
+# Bootstrap caching: unversioned URLs revalidate soon, ?v=<current version> is immutable
+BOOTSTRAP_MAX_AGE = 300
+BOOTSTRAP_STALE_WHILE_REVALIDATE = 86400
+BOOTSTRAP_IMMUTABLE_MAX_AGE = 365 * 86400
+
 @app.route('/')
 def index():
     """Serve the main HTML page"""
@@ -35,13 +58,62 @@ def static_files(filename):
         return send_from_directory('static', filename)
     return send_file('static/index.html')
 
+def _encode_cursor(name):
+    """Opaque cursor pointing just past the named record"""
+    return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """Record name from a cursor made by _encode_cursor"""
+    return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+
+def _catalog_page(catalog, records, columns, exclusive=False):
+    """
+    One page of catalog records as JSON: {'items': [...], 'next_cursor': ...}.
+    
+    Only the requested page is projected and serialized, so the response cost
+    depends on limit and fields, not on the catalog size.
+    """
+    fields = [field for field in request.args.get('fields', '').split(',') if field] or list(columns)
+    unknown = [field for field in fields if field not in columns]
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    try:
+        page, has_more = catalog.page(records, _decode_cursor(cursor) if cursor else None, limit, exclusive=exclusive)
+    except (ValueError, KeyError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'items': [{field: record[field] for field in fields} for record in page],
+        'next_cursor': _encode_cursor(page[-1]['name']) if has_more else None
+    })
+
 # API Routes
 @app.route('/api/products')
 def api_products():
-    """Get all products"""
+    """Get products: the whole catalog, or one page with ?limit/cursor/fields/category"""
     try:
-        products = get_products()
-        return jsonify(products)
+        catalog = get_catalog()
+        if not any(param in request.args for param in PAGE_PARAMS):
+            return jsonify(thaw(catalog.products))
+        
+        category = request.args.get('category')
+        records = catalog.products_in_category(category) if category else catalog.products
+        return _catalog_page(catalog, records, PRODUCT_FIELDS)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/categories')
+def api_categories():
+    """Get product categories"""
+    try:
+        catalog = get_catalog()
+        return jsonify({
+            'categories': list(catalog.categories),
+            'exclusive_categories': list(catalog.exclusive_categories)
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -49,8 +121,7 @@ def api_products():
 def api_planets():
     """Get all planets"""
     try:
-        planets = get_planets()
-        return jsonify(planets)
+        return jsonify(thaw(get_catalog().planets))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -58,17 +129,181 @@ def api_planets():
 def api_agencies():
     """Get all space agencies"""
     try:
-        agencies = get_space_agencies()
-        return jsonify(agencies)
+        return jsonify(thaw(get_catalog().space_agencies))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/exclusive-products')
 def api_exclusive_products():
-    """Get planet exclusive products"""
+    """Get planet exclusive products: all by planet, or one page with ?limit/cursor/fields/category/planet"""
+    try:
+        catalog = get_catalog()
+        if not any(param in request.args for param in PAGE_PARAMS):
+            return jsonify(thaw(catalog.exclusive_products))
+        
+        planet = request.args.get('planet')
+        category = request.args.get('category')
+        if planet:
+            if catalog.planet(planet) is None:
+                return jsonify({'error': 'Invalid planet'}), 400
+            records = catalog.exclusive_to(planet)
+            if category:
+                records = tuple(p for p in records if p['category'] == category)
+        elif category:
+            records = catalog.exclusive_in_category(category)
+        else:
+            records = catalog.all_exclusive_products
+        return _catalog_page(catalog, records, EXCLUSIVE_PRODUCT_FIELDS, exclusive=True)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@lru_cache(maxsize=2)
+def _bootstrap_payload(catalog):
+    """
+    Everything the web client needs to start, serialized and compressed once per
+    catalog version: ({encoding: body bytes}, content hash).
+    """
+    payload = {
+        'version': catalog.version,
+        'products': thaw(catalog.products),
+        'planets': thaw(catalog.planets),
+        'agencies': thaw(catalog.space_agencies),
+        'exclusive_products': thaw(catalog.exclusive_products),
+        'categories': list(catalog.categories),
+    }
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    bodies = {
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        'br': brotli.compress(body, quality=11),
+    }
+    return bodies, hashlib.sha256(body).hexdigest()[:32]
+
+@app.route('/api/bootstrap')
+def api_bootstrap():
+    """Get products, planets, agencies and exclusive products in one pre-compressed response"""
+    try:
+        catalog = get_catalog()
+        bodies, content_hash = _bootstrap_payload(catalog)
+        
+        # Best encoding the client accepts (quality values ignored except 0)
+        accepted = request.accept_encodings
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in bodies and accepted[candidate]:
+                encoding = candidate
+                break
+        
+        response = app.response_class(bodies[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        # Each encoding is a different representation, so it gets its own tag
+        response.set_etag(f"{content_hash}-{encoding}")
+        response.cache_control.public = True
+        if request.args.get('v') == catalog.version:
+            response.cache_control.max_age = BOOTSTRAP_IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = BOOTSTRAP_MAX_AGE
+            response.cache_control.stale_while_revalidate = BOOTSTRAP_STALE_WHILE_REVALIDATE
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@lru_cache(maxsize=64)
+def _priced_catalog_payload(catalog, planet_name, bucket):
+    """Serialize the priced catalog once per catalog version, planet and pricing window"""
+    payload = priced_catalog(
+        planet_name,
+        catalog.planet(planet_name),
+        catalog.products,
+        catalog.exclusive_to(planet_name),
+        bucket=bucket
+    )
+    payload['valid_until'] = (bucket + 1) * QUOTE_WINDOW_SECONDS
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()
+
+@app.route('/api/catalog/priced')
+def api_priced_catalog():
+    """Get the catalog with server-side prices for one planet"""
     try:
-        exclusive = get_planet_exclusive_products()
-        return jsonify(exclusive)
+        planet = request.args.get('planet')
+        catalog = get_catalog()
+        if catalog.planet(planet) is None:
+            return jsonify({'error': 'Invalid planet'}), 400
+        
+        # Prices are seeded per pricing window, so the body (and its ETag)
+        # only changes when the window rolls over
+        bucket = quote_bucket()
+        body, etag = _priced_catalog_payload(catalog, planet, bucket)
+        
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max(0, int((bucket + 1) * QUOTE_WINDOW_SECONDS - time.time()))
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/search')
+def api_search():
+    """Full-text search over products and planet exclusives"""
+    try:
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('kind')
+        limit = request.args.get('limit', 20, type=int)
+        
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        if kind not in (None, 'product', 'exclusive'):
+            return jsonify({'error': 'kind must be product or exclusive'}), 400
+        limit = max(1, min(limit, 100))
+        
+        total, results = search_products(query, limit=limit, kind=kind)
+        return jsonify({'query': query, 'total': total, 'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/compare')
+def api_compare():
+    """Compare product prices across planets"""
+    try:
+        product_names = request.args.getlist('product')
+        planet_names = request.args.getlist('planet')
+        
+        if not product_names:
+            return jsonify({'error': 'At least one product is required'}), 400
+        
+        catalog = get_catalog()
+        missing = [name for name in product_names if catalog.product(name) is None]
+        if missing:
+            return jsonify({'error': f"Unknown products: {', '.join(missing)}"}), 400
+        
+        # Compare across every planet unless specific ones were requested
+        planets = catalog.planets
+        if planet_names:
+            unknown = [name for name in planet_names if name not in planets]
+            if unknown:
+                return jsonify({'error': f"Unknown planets: {', '.join(unknown)}"}), 400
+            planets = {name: planets[name] for name in planet_names}
+        
+        comparisons = compare_catalog_prices(
+            [catalog.product(name) for name in product_names],
+            planets,
+            bucket=quote_bucket()
+        )
+        
+        # Numbers for clients that compute, display strings for ones that only render
+        for comparison in comparisons:
+            comparison['base_price_display'] = format_price(comparison['base_price'])
+            comparison['savings_display'] = format_price(comparison['savings'])
+            for entry in comparison['planets']:
+                entry['delivery_cost_display'] = format_price(entry['delivery_cost'])
+                entry['total_price_display'] = format_price(entry['total_price'])
+        
+        return jsonify({'comparisons': comparisons})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -112,13 +347,16 @@ def api_create_order():
         # Generate tracking number and delivery time
         tracking_number = generate_tracking_number()
         
+        catalog = get_catalog()
+        product = catalog.product(product_name) or catalog.exclusive_product(product_name)
+        product_category = product['category'] if product else "General"
+        
         if is_exclusive:
             estimated_delivery_time = "Same day"
             base_price_usd = total_price_inr / 83  # Convert back to USD
             delivery_cost_usd = 0.0
         else:
-            planets = get_planets()
-            planet_info = planets.get(destination_planet)
+            planet_info = catalog.planet(destination_planet)
             if planet_info:
                 estimated_delivery_time = calculate_estimated_delivery_time(planet_info)
                 base_price_usd = (total_price_inr / 83) * 0.2  # Estimate base price
@@ -132,7 +370,7 @@ def api_create_order():
         order_id = db_utils.create_order(
             user_id=user_id,
             product_name=product_name,
-            product_category="General",  # Could be improved
+            product_category=product_category,
             destination_planet=destination_planet,
             base_price_usd=base_price_usd,
             delivery_cost_usd=delivery_cost_usd,
@@ -176,18 +414,19 @@ def api_ai_search():
             return jsonify({'error': 'Product query and target planet are required'}), 400
         
         # Get planet info
-        planets = get_planets()
-        planet_info = planets.get(target_planet)
+        planet_info = get_catalog().planet(target_planet)
         if not planet_info:
             return jsonify({'error': 'Invalid planet'}), 400
         
-        # Get AI-generated product info and pricing
+        # Same query, planet and pricing window -> same quote
+        quote = quote_seed(product_query, target_planet)
+        
+        # Get AI-generated product info and pricing, concurrently under one deadline
         try:
-            product_description = generate_product_description(product_query, target_planet)
-            ai_price = get_ai_pricing(product_query, planet_info)
+            product_description, ai_price = get_ai_search_results(product_query, target_planet, planet_info, seed=quote)
             
             # Calculate total price
-            delivery_cost = calculate_delivery_cost(ai_price['base_price'], planet_info)
+            delivery_cost = calculate_delivery_cost(ai_price['base_price'], planet_info, seed=quote)
             total_price = ai_price['base_price'] + delivery_cost
             
             # Add to search history
@@ -205,8 +444,8 @@ def api_ai_search():
             
         except Exception as ai_error:
             # Fallback to mock pricing if AI fails
-            mock_price = random.uniform(50, 500)
-            delivery_cost = calculate_delivery_cost(mock_price, planet_info)
+            mock_price = seeded_random(quote).uniform(50, 500)
+            delivery_cost = calculate_delivery_cost(mock_price, planet_info, seed=quote)
             total_price = mock_price + delivery_cost
             
             return jsonify({
@@ -222,6 +461,128 @@ def api_ai_search():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _sse(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/ai-search/stream')
+def api_ai_search_stream():
+    """
+    Stream an AI product search as Server-Sent Events
+
+    Sends a 'pricing' event (same fields as /api/ai-search, minus the
+    description) as soon as pricing is ready, then 'description' events with
+    the description text as the model writes it, then 'done'.
+    """
+    product_query = request.args.get('q', '').strip()
+    target_planet = request.args.get('planet', '')
+    user_session = request.args.get('session') or str(uuid.uuid4())
+    
+    if not product_query or not target_planet:
+        return jsonify({'error': 'Product query and target planet are required'}), 400
+    
+    planet_info = get_catalog().planet(target_planet)
+    if not planet_info:
+        return jsonify({'error': 'Invalid planet'}), 400
+    
+    # Same query, planet and pricing window -> same quote
+    quote = quote_seed(product_query, target_planet)
+    
+    def events():
+        # Flush headers and a first byte straight away
+        yield ": stream open\n\n"
+        try:
+            for kind, value in stream_ai_search(product_query, target_planet, planet_info, seed=quote):
+                if kind == 'pricing':
+                    delivery_cost = calculate_delivery_cost(value['base_price'], planet_info, seed=quote)
+                    total_price = value['base_price'] + delivery_cost
+                    db_utils.add_search_history(product_query, target_planet, total_price, user_session)
+                    yield _sse('pricing', {
+                        'product_query': product_query,
+                        'target_planet': target_planet,
+                        'base_price': value['base_price'],
+                        'total_price': total_price,
+                        'multiplier': value['multiplier'],
+                        'reasoning': value['reasoning']
+                    })
+                else:
+                    yield _sse('description', {'text': value})
+            yield _sse('done', {})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Keep reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/ai-compare')
+def api_ai_compare():
+    """Compare AI pricing for any product across planets with one Gemini call"""
+    try:
+        product_query = request.args.get('q', '').strip()
+        planet_names = request.args.getlist('planet')
+        
+        if not product_query:
+            return jsonify({'error': 'Product query is required'}), 400
+        
+        planets = get_catalog().planets
+        if planet_names:
+            unknown = [name for name in planet_names if name not in planets]
+            if unknown:
+                return jsonify({'error': f"Unknown planets: {', '.join(unknown)}"}), 400
+            planets = {name: planets[name] for name in planet_names}
+        
+        seeds = {name: quote_seed(product_query, name) for name in planets}
+        pricing = get_batch_ai_pricing(product_query, planets, seeds=seeds)
+        
+        results = []
+        for planet_name, ai_price in pricing.items():
+            delivery_cost = calculate_delivery_cost(ai_price['base_price'], planets[planet_name], seed=seeds[planet_name])
+            total_price = ai_price['base_price'] + delivery_cost
+            results.append({
+                'planet': planet_name,
+                'base_price': ai_price['base_price'],
+                'multiplier': ai_price['multiplier'],
+                'reasoning': ai_price['reasoning'],
+                'delivery_cost': delivery_cost,
+                'total_price': total_price,
+                'total_price_display': format_price(total_price)
+            })
+        results.sort(key=lambda entry: entry['total_price'])
+        
+        return jsonify({'product_query': product_query, 'planets': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics')
+def metrics():
+    """AI call metrics for this worker in Prometheus text format"""
+    return Response(get_ai_metrics().prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/ai-metrics')
+def api_ai_metrics():
+    """Per-kind summary of AI calls: latency percentiles, sizes, tokens, cache and fallback counts, plus the rate limiter queues"""
+    try:
+        summary = get_ai_metrics().summary()
+        summary['rate_limiter'] = gemini_limiter.stats()
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ai-cache/stats')
+def api_ai_cache_stats():
+    """Get AI cache hit/miss counters and size, single-flight sharing, Gemini breaker state and near-duplicate matches"""
+    try:
+        stats = get_ai_cache().stats()
+        stats['singleflight'] = get_singleflight().stats()
+        stats['circuit_breaker'] = gemini_breaker.stats()
+        stats['similar_queries'] = get_query_index().stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/analytics')
 def api_analytics():
     """Get analytics data"""
@@ -244,6 +605,14 @@ if __name__ == '__main__':
     except Exception as e:
         print(f"⚠️ Database initialization warning: {e}")
     
+    # Serialize and compress the bootstrap payload before the first request
+    _bootstrap_payload(get_catalog())
+    
+    # Keep popular searches' AI results cached, refreshing them off-peak
+    if os.environ.get('SPACEBUY_WARM_SCHEDULE') == '1':
+        from ai_warmer import start_warmer_thread
+        start_warmer_thread()
+    
     # Run the server
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
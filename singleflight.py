@@ -0,0 +1,118 @@
+"""
+Single-flight coordination for duplicate in-flight work
+
+When many requests need the same expensive result at the same time (a viral
+AI search), only the first one computes it; the others wait and share the
+result. Within a process this uses threading primitives. Optionally, a
+striped set of lock files extends it across worker processes on one machine:
+the process holding the stripe's lock computes, the others block on it and
+then find the result in the shared cache.
+"""
+
+import os
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (e.g. Windows): coordination stays within each process
+    fcntl = None
+
+# Directory for cross-process lock files; unset means threads only
+SINGLEFLIGHT_LOCK_DIR = os.environ.get('SPACEBUY_SINGLEFLIGHT_LOCK_DIR')
+# Keys are hashed onto this many lock files so the directory stays bounded
+LOCK_STRIPES = 256
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Run fn once per key among concurrent callers.
+
+    do(key, fn, *args) returns fn's result; callers arriving while a call for
+    the same key is running wait for it instead (and get its exception if it
+    raised). With lock_dir set, the leader also holds an exclusive flock for
+    the key's stripe while fn runs, so fn should re-check any shared cache
+    first: a process that waited on the lock will find the result there.
+    """
+
+    def __init__(self, lock_dir=SINGLEFLIGHT_LOCK_DIR):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'leaders': 0, 'shared': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._counters['shared'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._counters['leaders'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, args, kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run(self, key, fn, args, kwargs):
+        if not self.lock_dir:
+            return fn(*args, **kwargs)
+
+        stripe = int(hashlib.blake2b(str(key).encode('utf-8'), digest_size=4).hexdigest(), 16) % LOCK_STRIPES
+        path = os.path.join(self.lock_dir, f"singleflight-{stripe:03d}.lock")
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        """Calls made vs calls shared, plus keys currently in flight"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight():
+    """The process-wide SingleFlight, configured from SPACEBUY_SINGLEFLIGHT_LOCK_DIR"""
+    global _singleflight
+    if _singleflight is None:
+        with _singleflight_lock:
+            if _singleflight is None:
+                _singleflight = SingleFlight()
+    return _singleflight
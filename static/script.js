@@ -8,7 +8,7 @@ class SpaceBuy {
             loyalty_level: 'Galactic Wanderer',
             email: 'explorer@spacebuy.com'
         };
-        this.products = [];
+        this.categories = [];
         this.planets = {};
         this.spaceAgencies = {};
         this.planetExclusiveProducts = {};
@@ -29,18 +29,17 @@ class SpaceBuy {
         try {
             this.showLoading(true);
             
-            // Load all data from the backend
-            const [productsRes, planetsRes, agenciesRes, exclusiveRes] = await Promise.all([
-                fetch('/api/products'),
-                fetch('/api/planets'),
-                fetch('/api/agencies'),
-                fetch('/api/exclusive-products')
-            ]);
+            // One pre-compressed, cacheable response with everything the first render needs
+            const response = await fetch('/api/bootstrap');
+            if (!response.ok) {
+                throw new Error('Bootstrap request failed');
+            }
+            const bootstrap = await response.json();
             
-            this.products = await productsRes.json();
-            this.planets = await planetsRes.json();
-            this.spaceAgencies = await agenciesRes.json();
-            this.planetExclusiveProducts = await exclusiveRes.json();
+            this.planets = bootstrap.planets;
+            this.spaceAgencies = bootstrap.agencies;
+            this.categories = bootstrap.categories;
+            this.planetExclusiveProducts = bootstrap.exclusive_products;
             
         } catch (error) {
             console.error('Error loading data:', error);
@@ -128,8 +127,7 @@ class SpaceBuy {
         
         // Populate category filter
         const categoryFilter = document.getElementById('category-filter');
-        const categories = [...new Set(this.products.map(p => p.category))];
-        categories.forEach(category => {
+        this.categories.forEach(category => {
             const option = document.createElement('option');
             option.value = category;
             option.textContent = category;
@@ -237,12 +235,34 @@ class SpaceBuy {
         }
     }
     
-    updateProductDisplay() {
+    async fetchPricedCatalog(planet) {
+        // Prices are computed server-side; the browser revalidates them with the ETag
+        const response = await fetch(`/api/catalog/priced?planet=${encodeURIComponent(planet)}`);
+        if (!response.ok) {
+            throw new Error(`Failed to load prices for ${planet}`);
+        }
+        return response.json();
+    }
+    
+    async updateProductDisplay() {
         if (!this.currentPlanet) return;
         
         this.checkSunWarning();
         if (this.currentPlanet.toLowerCase() === 'sun') return;
         
+        const planet = this.currentPlanet;
+        let pricedCatalog;
+        try {
+            pricedCatalog = await this.fetchPricedCatalog(planet);
+        } catch (error) {
+            console.error('Error loading prices:', error);
+            this.showNotification('Failed to load prices', 'error');
+            return;
+        }
+        
+        // The user may have picked another planet while prices were loading
+        if (planet !== this.currentPlanet) return;
+        
         // Update planet info
         const planetInfo = this.planets[this.currentPlanet];
         if (planetInfo) {
@@ -256,16 +276,16 @@ class SpaceBuy {
         
         // Filter products
         const categoryFilter = document.getElementById('category-filter').value;
-        let filteredProducts = this.products;
+        let filteredProducts = pricedCatalog.products;
         if (categoryFilter !== 'All') {
-            filteredProducts = this.products.filter(p => p.category === categoryFilter);
+            filteredProducts = filteredProducts.filter(p => p.category === categoryFilter);
         }
         
         // Display Earth products
         this.displayEarthProducts(filteredProducts);
         
         // Display exclusive products
-        this.displayExclusiveProducts();
+        this.displayExclusiveProducts(pricedCatalog.exclusive_products);
     }
     
     displayEarthProducts(products) {
@@ -278,18 +298,18 @@ class SpaceBuy {
         });
     }
     
-    displayExclusiveProducts() {
+    displayExclusiveProducts(products) {
         const container = document.getElementById('exclusive-products-list');
         const exclusiveSection = document.getElementById('exclusive-products');
         
-        if (this.planetExclusiveProducts[this.currentPlanet]) {
+        if (products.length > 0) {
             exclusiveSection.style.display = 'block';
             container.innerHTML = '';
             
             document.getElementById('exclusive-products-title').textContent = 
                 `⭐ ${this.currentPlanet} Exclusive Products`;
             
-            this.planetExclusiveProducts[this.currentPlanet].forEach(product => {
+            products.forEach(product => {
                 const productCard = this.createProductCard(product, true);
                 container.appendChild(productCard);
             });
@@ -302,15 +322,8 @@ class SpaceBuy {
         const card = document.createElement('div');
         card.className = 'product-card';
         
-        const planetInfo = this.planets[this.currentPlanet];
-        let deliveryCost = 0;
-        let totalPrice = product.base_price;
-        
-        if (!isExclusive) {
-            // Calculate delivery cost for Earth products
-            deliveryCost = this.calculateDeliveryCost(product.base_price, planetInfo);
-            totalPrice = product.base_price + deliveryCost;
-        }
+        // Products arrive already priced for the current planet
+        const totalPrice = product.total_price;
         
         const agency = this.getRandomAgency();
         const agencyInfo = this.spaceAgencies[agency];
@@ -318,7 +331,7 @@ class SpaceBuy {
         card.innerHTML = `
             <div class="product-header">
                 <div class="product-title">${product.emoji} ${product.name}</div>
-                <div class="product-price">${this.formatPrice(totalPrice)}</div>
+                <div class="product-price">${product.total_price_display}</div>
             </div>
             <div class="product-details">
                 <div class="product-info">
@@ -329,8 +342,9 @@ class SpaceBuy {
                          <p style="color: #28a745;"><strong>✨ FREE LOCAL DELIVERY! No interplanetary shipping costs!</strong></p>
                          <p><strong>Local Delivery by:</strong> ${this.currentPlanet} Express Delivery</p>
                          <p><strong>Estimated Delivery:</strong> Same day delivery!</p>` :
-                        `<p><strong>Earth Price:</strong> ${this.formatPrice(product.base_price)}</p>
-                         <p><strong>${this.currentPlanet} Price:</strong> ${this.formatPrice(totalPrice)}</p>
+                        `<p><strong>Earth Price:</strong> ${product.base_price_display}</p>
+                         <p><strong>Delivery Cost:</strong> ${product.delivery_cost_display}</p>
+                         <p><strong>${this.currentPlanet} Price:</strong> ${product.total_price_display}</p>
                          <p><strong>Delivery by:</strong> ${agency} - ${agencyInfo.motto}</p>
                          <p><strong>Reliability:</strong> ${agencyInfo.reliability}</p>
                          <p><strong>Estimated Delivery:</strong> ${agencyInfo.delivery_time}</p>`
@@ -338,7 +352,7 @@ class SpaceBuy {
                 </div>
                 <div class="product-actions">
                     <button class="buy-btn" onclick="spaceBuy.handlePurchase('${product.name}', ${totalPrice}, '${agency}', ${isExclusive})">
-                        ${isExclusive ? `💳 Buy Local for ${this.formatPrice(totalPrice)}` : `💸 Buy for ${this.formatPrice(totalPrice)}`}
+                        ${isExclusive ? `💳 Buy Local for ${product.total_price_display}` : `💸 Buy for ${product.total_price_display}`}
                     </button>
                     ${isExclusive ? 
                         `<div style="background: rgba(40, 167, 69, 0.2); padding: 10px; border-radius: 5px; margin-top: 10px; font-size: 12px;">
@@ -356,15 +370,6 @@ class SpaceBuy {
         return card;
     }
     
-    calculateDeliveryCost(basePrice, planetInfo) {
-        // Simplified cost calculation based on distance and gravity
-        const distanceFactor = Math.pow(planetInfo.distance, 2);
-        const gravityFactor = Math.abs(planetInfo.gravity - 1) + 1;
-        const baseCost = basePrice * 5; // 500% base delivery cost
-        
-        return baseCost * distanceFactor * gravityFactor;
-    }
-    
     getRandomAgency() {
         const agencies = Object.keys(this.spaceAgencies);
         return agencies[Math.floor(Math.random() * agencies.length)];
@@ -409,7 +414,37 @@ class SpaceBuy {
         }
     }
     
-    showPlanetExclusives(planet) {
+    async fetchExclusiveProducts(planet) {
+        // Page through one planet's exclusives, only the fields the cards show
+        if (this.planetExclusiveProducts[planet]) {
+            return this.planetExclusiveProducts[planet];
+        }
+        
+        const products = [];
+        let cursor = null;
+        do {
+            const params = new URLSearchParams({
+                planet: planet,
+                fields: 'name,emoji,description,category,base_price',
+                limit: '100'
+            });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            const response = await fetch(`/api/exclusive-products?${params}`);
+            if (!response.ok) {
+                throw new Error('Failed to load exclusive products');
+            }
+            const page = await response.json();
+            products.push(...page.items);
+            cursor = page.next_cursor;
+        } while (cursor);
+        
+        this.planetExclusiveProducts[planet] = products;
+        return products;
+    }
+    
+    async showPlanetExclusives(planet) {
         const container = document.getElementById('exclusives-content');
         
         if (!planet) {
@@ -417,8 +452,19 @@ class SpaceBuy {
             return;
         }
         
-        if (this.planetExclusiveProducts[planet]) {
-            const products = this.planetExclusiveProducts[planet];
+        let products;
+        try {
+            products = await this.fetchExclusiveProducts(planet);
+        } catch (error) {
+            console.error('Error loading exclusive products:', error);
+            this.showNotification('Failed to load exclusive products', 'error');
+            return;
+        }
+        
+        // The user may have picked another planet while products were loading
+        if (planet !== document.getElementById('exclusive-planet').value) return;
+        
+        if (products.length > 0) {
             let html = `<h3>🪐 ${planet} Exclusive Products</h3>`;
             html += '<div class="exclusive-products-grid">';
             
@@ -468,11 +514,16 @@ class SpaceBuy {
         
         this.showLoading(true);
         
-        // Find matching products from our catalog
-        const matchedProducts = this.products.filter(p => 
-            p.name.toLowerCase().includes(productName.toLowerCase()) ||
-            p.description.toLowerCase().includes(productName.toLowerCase())
-        );
+        // Best-ranked Earth product from the server-side search index
+        let matchedProducts = [];
+        try {
+            const response = await fetch(`/api/search?q=${encodeURIComponent(productName)}&kind=product&limit=1`);
+            if (response.ok) {
+                matchedProducts = (await response.json()).results;
+            }
+        } catch (error) {
+            console.error('Product search error:', error);
+        }
         
         if (matchedProducts.length === 0) {
             document.getElementById('comparison-results').innerHTML = `
@@ -486,28 +537,48 @@ class SpaceBuy {
             return;
         }
         
-        const product = matchedProducts[0]; // Use first match
+        const product = matchedProducts[0]; // Use best match
         let html = `<h3>🚀 Price Comparison for "${product.name}" across the galaxy!</h3>`;
         html += '<div class="comparison-results">';
         
-        // Compare prices across all planets
-        Object.keys(this.planets).forEach(planet => {
-            const planetInfo = this.planets[planet];
-            const totalPrice = product.base_price + this.calculateDeliveryCost(product.base_price, planetInfo);
+        // Rank the product across every planet server-side in one request
+        let comparison;
+        try {
+            const response = await fetch(`/api/compare?product=${encodeURIComponent(product.name)}`);
+            if (!response.ok) {
+                throw new Error('Comparison request failed');
+            }
+            comparison = (await response.json()).comparisons[0];
+        } catch (error) {
+            console.error('Price comparison error:', error);
+            this.showNotification('Price comparison failed. Please try again.', 'error');
+            this.showLoading(false);
+            return;
+        }
+        
+        comparison.planets.forEach(entry => {
+            const planetInfo = this.planets[entry.planet];
             
             html += `
                 <div class="planet-comparison-card">
-                    <h4>🪐 ${planet}</h4>
+                    <h4>🪐 #${entry.rank} ${entry.planet}</h4>
                     <p><strong>Distance:</strong> ${planetInfo.distance} AU</p>
-                    <p><strong>Total Price:</strong> ${this.formatPrice(totalPrice)}</p>
-                    <p><strong>Delivery Cost:</strong> ${this.formatPrice(this.calculateDeliveryCost(product.base_price, planetInfo))}</p>
+                    <p><strong>Total Price:</strong> ${entry.total_price_display}</p>
+                    <p><strong>Delivery Cost:</strong> ${entry.delivery_cost_display}</p>
                     <div style="font-size: 12px; color: #aaa; margin-top: 10px;">
-                        Base price: ${this.formatPrice(product.base_price)}
+                        Base price: ${comparison.base_price_display}
                     </div>
                 </div>
             `;
         });
         
+        html += `
+            <div class="planet-comparison-card">
+                <h4>💡 Savings</h4>
+                <p>Choose ${comparison.cheapest} over ${comparison.most_expensive} and save ${comparison.savings_display}!</p>
+            </div>
+        `;
+        
         html += '</div>';
         document.getElementById('comparison-results').innerHTML = html;
         this.showLoading(false);
@@ -572,6 +643,49 @@ class SpaceBuy {
         
         this.showLoading(true);
         
+        if (window.EventSource) {
+            this.streamAISearch(query, targetPlanet);
+        } else {
+            await this.fetchAISearch(query, targetPlanet);
+        }
+    }
+    
+    streamAISearch(query, targetPlanet) {
+        // Price arrives first, then the description streams in as the AI writes it
+        const params = new URLSearchParams({
+            q: query,
+            planet: targetPlanet,
+            session: this.getUserSession()
+        });
+        const source = new EventSource(`/api/ai-search/stream?${params}`);
+        let priced = false;
+        let description = null;
+        
+        source.addEventListener('pricing', (event) => {
+            priced = true;
+            this.showLoading(false);
+            this.displaySearchResults({ ...JSON.parse(event.data), product_description: '' }, targetPlanet);
+            description = document.getElementById('ai-description');
+        });
+        
+        source.addEventListener('description', (event) => {
+            if (description) {
+                description.textContent += JSON.parse(event.data).text;
+            }
+        });
+        
+        source.addEventListener('done', () => source.close());
+        
+        // Server-sent error events and connection failures alike
+        source.addEventListener('error', () => {
+            source.close();
+            if (!priced) {
+                this.fetchAISearch(query, targetPlanet);
+            }
+        });
+    }
+    
+    async fetchAISearch(query, targetPlanet) {
         try {
             const response = await fetch('/api/ai-search', {
                 method: 'POST',
@@ -612,7 +726,7 @@ class SpaceBuy {
                 </div>
                 <div class="product-details">
                     <div class="product-info">
-                        <p><strong>AI Description:</strong> ${result.product_description}</p>
+                        <p><strong>AI Description:</strong> <span id="ai-description">${result.product_description}</span></p>
                         <p><strong>AI Reasoning:</strong> ${result.reasoning}</p>
                         <hr style="margin: 15px 0; border: 1px solid rgba(157, 78, 221, 0.3);">
                         <h4>💰 Detailed AI Price Breakdown:</h4>
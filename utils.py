@@ -2,64 +2,201 @@
 Utility functions for SpaceBuy interplanetary e-commerce platform
 """
 
+import os
+import time
 import random
 import math
+import hashlib
+from functools import lru_cache
 
-def calculate_delivery_cost(base_price, planet_info):
+# Special atmosphere considerations - much more extreme
+ATMOSPHERE_MULTIPLIERS = {
+    'None': 25.0,  # Need complete life support systems
+    'Toxic': 50.0,  # Hazmat protocols and medical insurance
+    'Thin': 15.0,  # Partial life support and pressurization
+    'Dense': 40.0,  # Heavy-duty pressure suits and reinforcement
+    'Icy': 30.0,   # Industrial heating systems and thermal protection
+    'Plasma': 200.0  # Completely impossible but we'll charge anyway
+}
+
+# Range of the random "market conditions" multiplier applied to delivery costs
+MARKET_VOLATILITY_RANGE = (2.0, 8.0)
+
+# Seeded quotes are stable for this many seconds, so identical requests inside
+# one window get identical prices and can be cached
+QUOTE_WINDOW_SECONDS = int(os.environ.get('SPACEBUY_QUOTE_WINDOW_SECONDS', 900))
+
+# SplitMix64 finalizer constants; pricing_engine mixes seed arrays with the same values
+MIX64_MULTIPLIERS = (0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+_MASK64 = (1 << 64) - 1
+
+@lru_cache(maxsize=1 << 18)
+def stable_hash(text):
+    """
+    64-bit hash of a string that is identical across processes and restarts
+    (unlike the built-in hash(), which is salted per process)
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def mix64(value):
+    """
+    Scramble a 64-bit integer so nearby seeds give unrelated results
+    """
+    value &= _MASK64
+    value = ((value ^ (value >> 30)) * MIX64_MULTIPLIERS[0]) & _MASK64
+    value = ((value ^ (value >> 27)) * MIX64_MULTIPLIERS[1]) & _MASK64
+    return value ^ (value >> 31)
+
+def quote_bucket(now=None, window=None):
+    """
+    Index of the pricing window containing `now` (defaults to the current time)
+    """
+    now = time.time() if now is None else now
+    return int(now // (window or QUOTE_WINDOW_SECONDS))
+
+def quote_seed(product_name, planet_name, bucket=None):
+    """
+    Deterministic seed for quoting a product on a planet within one pricing window
+    """
+    if bucket is None:
+        bucket = quote_bucket()
+    return mix64(stable_hash(product_name) ^ mix64(stable_hash(planet_name) ^ bucket))
+
+def seeded_uniform(seed, low, high):
+    """
+    Uniform float in [low, high) derived only from the seed
+    """
+    return low + (high - low) * ((mix64(seed) >> 11) * 2.0 ** -53)
+
+def seeded_random(seed=None):
+    """
+    Random source for the given seed; the shared global generator when seed is None
+    """
+    return random if seed is None else random.Random(seed)
+
+class PlanetFactors:
+    """
+    Pricing factors for one planet, compiled once from its planet info
+    """
+    __slots__ = (
+        'distance', 'distance_factor', 'gravity_factor', 'difficulty_factor',
+        'atmosphere_key', 'atmosphere_factor', 'distance_term', 'gravity_term',
+        'difficulty_term', 'atmosphere_term', 'sun_multiplier', 'distance_penalty'
+    )
+
+    def __init__(self, distance, gravity, atmosphere, delivery_difficulty, fun_fact=''):
+        # Base factors
+        self.distance = distance
+        self.distance_factor = distance ** 1.5  # Distance has exponential impact
+        self.gravity_factor = abs(gravity - 1.0) + 1.0  # Deviation from Earth gravity
+        self.difficulty_factor = delivery_difficulty / 10.0
+
+        self.atmosphere_key = 'None'  # Default
+        for key in ATMOSPHERE_MULTIPLIERS:
+            if key.lower() in atmosphere.lower():
+                self.atmosphere_key = key
+                break
+        self.atmosphere_factor = ATMOSPHERE_MULTIPLIERS[self.atmosphere_key]
+
+        # Powered terms exactly as they enter the delivery cost formula
+        self.distance_term = self.distance_factor ** 2  # Square the distance impact
+        self.gravity_term = self.gravity_factor ** 1.5
+        self.difficulty_term = self.difficulty_factor ** 2
+        self.atmosphere_term = self.atmosphere_factor ** 1.5
+
+        # Special case for Sun - absolutely insane costs
+        is_sun = 'sun' in fun_fact.lower() or delivery_difficulty >= 10
+        self.sun_multiplier = 500 if is_sun else 1  # Because it's literally the Sun
+
+        # Additional distance penalties for outer planets
+        self.distance_penalty = distance * 2 if distance > 10 else 1  # Beyond Jupiter
+
+def _planet_key(planet_info):
+    """Hashable snapshot of the planet fields that affect pricing"""
+    return (
+        planet_info['distance'],
+        planet_info['gravity'],
+        planet_info['atmosphere'],
+        planet_info['delivery_difficulty'],
+        planet_info.get('fun_fact', '')
+    )
+
+@lru_cache(maxsize=256)
+def _compile_planet_factors(key):
+    return PlanetFactors(*key)
+
+def get_planet_factors(planet_info):
+    """
+    Get the compiled PlanetFactors for a planet info dict
+
+    Results are cached on the pricing-relevant fields, so edited planet data
+    compiles a fresh entry instead of reusing stale factors.
+    """
+    if isinstance(planet_info, PlanetFactors):
+        return planet_info
+    return _compile_planet_factors(_planet_key(planet_info))
+
+def compile_planet_factors(planets):
+    """
+    Compile a {planet name: PlanetFactors} table from get_planets()-style data
+    """
+    return {name: get_planet_factors(info) for name, info in planets.items()}
+
+def calculate_delivery_cost(base_price, planet_info, market_volatility=None, seed=None):
     """
     Calculate delivery cost based on planet characteristics
+
+    planet_info may be a planet info dict or its compiled PlanetFactors.
+    market_volatility can be passed in to reproduce a specific quote; otherwise it
+    is derived from seed (see quote_seed) or, by default, drawn at random from
+    MARKET_VOLATILITY_RANGE.
     """
-    # Base factors
-    distance_factor = planet_info['distance'] ** 1.5  # Distance has exponential impact
-    gravity_factor = abs(planet_info['gravity'] - 1.0) + 1.0  # Deviation from Earth gravity
-    difficulty_factor = planet_info['delivery_difficulty'] / 10.0
-    
-    # Special atmosphere considerations - much more extreme
-    atmosphere_multipliers = {
-        'None': 25.0,  # Need complete life support systems
-        'Toxic': 50.0,  # Hazmat protocols and medical insurance
-        'Thin': 15.0,  # Partial life support and pressurization
-        'Dense': 40.0,  # Heavy-duty pressure suits and reinforcement
-        'Icy': 30.0,   # Industrial heating systems and thermal protection
-        'Plasma': 200.0  # Completely impossible but we'll charge anyway
-    }
-    
-    atmosphere_key = 'None'  # Default
-    for key in atmosphere_multipliers:
-        if key.lower() in planet_info['atmosphere'].lower():
-            atmosphere_key = key
-            break
-    
-    atmosphere_factor = atmosphere_multipliers[atmosphere_key]
+    factors = get_planet_factors(planet_info)
     
     # Calculate base delivery cost - start much higher
     base_delivery = base_price * 5.0  # Start with 500% of product price
     
     # Apply all factors with much higher multipliers
     delivery_cost = (base_delivery * 
-                    (distance_factor ** 2) *  # Square the distance impact
-                    (gravity_factor ** 1.5) * 
-                    (difficulty_factor ** 2) * 
-                    (atmosphere_factor ** 1.5))
+                    factors.distance_term * 
+                    factors.gravity_term * 
+                    factors.difficulty_term * 
+                    factors.atmosphere_term)
     
     # Add massive randomness for "market conditions"
-    market_volatility = random.uniform(2.0, 8.0)  # Much higher volatility
+    if market_volatility is None and seed is not None:
+        market_volatility = seeded_uniform(seed, *MARKET_VOLATILITY_RANGE)
+    elif market_volatility is None:
+        market_volatility = random.uniform(*MARKET_VOLATILITY_RANGE)  # Much higher volatility
     delivery_cost *= market_volatility
     
     # Much higher minimum delivery cost
     minimum_delivery = base_price * 10.0  # Even Moon delivery is 10x product price
     delivery_cost = max(delivery_cost, minimum_delivery)
     
-    # Special case for Sun - absolutely insane costs
-    if 'sun' in planet_info.get('fun_fact', '').lower() or planet_info.get('delivery_difficulty', 0) >= 10:
-        delivery_cost *= 500  # Because it's literally the Sun
-    
-    # Additional distance penalties for outer planets
-    if planet_info['distance'] > 10:  # Beyond Jupiter
-        delivery_cost *= (planet_info['distance'] * 2)  # Distance penalty multiplier
+    delivery_cost *= factors.sun_multiplier
+    delivery_cost *= factors.distance_penalty
     
     return round(delivery_cost, 2)
 
+# Display tiers for format_price, checked from the top:
+# (minimum INR, divisor, number format, label)
+PRICE_TIERS = (
+    (100_000_000_000_000, 1_000_000_000_000, '.0f', ' Trillion (🌌 NATIONAL GDP LEVEL)'),  # 100+ Trillion INR
+    (10_000_000_000_000, 1_000_000_000_000, '.1f', ' Trillion (🏛️ BUY A COUNTRY)'),  # 10+ Trillion INR
+    (1_000_000_000_000, 1_000_000_000_000, '.2f', ' Trillion (🚀 SPACE PROGRAM BUDGET)'),  # 1+ Trillion INR
+    (100_000_000_000, 10_000_000, '.0f', ' Cr (💸 ECONOMIC COLLAPSE LEVEL)'),  # 100+ Billion INR
+    (10_000_000_000, 10_000_000, '.0f', ' Cr (🏭 INDUSTRIAL EMPIRE)'),  # 10+ Billion INR
+    (1_000_000_000, 10_000_000, '.1f', ' Cr (🏰 BILLIONAIRE STATUS)'),  # 1+ Billion INR
+    (100_000_000, 10_000_000, '.1f', ' Cr (🏠 LUXURY MANSION)'),  # 10+ Crore INR
+    (10_000_000, 10_000_000, '.2f', ' Cr (🚗 FERRARI COLLECTION)'),  # 1+ Crore INR
+    (1_000_000, 100_000, '.1f', ' L (💎 DIAMOND JEWELRY)'),  # 10+ Lakh INR
+    (100_000, 100_000, '.1f', ' L (💰 EXPENSIVE)'),  # 1+ Lakh INR
+    (1_000, 1, ',.0f', ''),  # Thousands INR
+)
+# Format for anything below the lowest tier
+SMALL_PRICE_FORMAT = ',.2f'
+
 def format_price(price):
     """
     Format price as currency in Indian Rupees with appropriate formatting for large numbers
@@ -67,30 +204,17 @@ def format_price(price):
     # Convert USD to INR (approximate rate: 1 USD = 83 INR)
     inr_price = price * 83
     
-    if inr_price >= 100_000_000_000_000:  # 100+ Trillion INR
-        return f"₹{inr_price/1_000_000_000_000:.0f} Trillion (🌌 NATIONAL GDP LEVEL)"
-    elif inr_price >= 10_000_000_000_000:  # 10+ Trillion INR
-        return f"₹{inr_price/1_000_000_000_000:.1f} Trillion (🏛️ BUY A COUNTRY)"
-    elif inr_price >= 1_000_000_000_000:  # 1+ Trillion INR
-        return f"₹{inr_price/1_000_000_000_000:.2f} Trillion (🚀 SPACE PROGRAM BUDGET)"
-    elif inr_price >= 100_000_000_000:  # 100+ Billion INR
-        return f"₹{inr_price/10_000_000:.0f} Cr (💸 ECONOMIC COLLAPSE LEVEL)"
-    elif inr_price >= 10_000_000_000:  # 10+ Billion INR
-        return f"₹{inr_price/10_000_000:.0f} Cr (🏭 INDUSTRIAL EMPIRE)"
-    elif inr_price >= 1_000_000_000:  # 1+ Billion INR
-        return f"₹{inr_price/10_000_000:.1f} Cr (🏰 BILLIONAIRE STATUS)"
-    elif inr_price >= 100_000_000:  # 10+ Crore INR
-        return f"₹{inr_price/10_000_000:.1f} Cr (🏠 LUXURY MANSION)"
-    elif inr_price >= 10_000_000:  # 1+ Crore INR
-        return f"₹{inr_price/10_000_000:.2f} Cr (🚗 FERRARI COLLECTION)"
-    elif inr_price >= 1_000_000:  # 10+ Lakh INR
-        return f"₹{inr_price/100_000:.1f} L (💎 DIAMOND JEWELRY)"
-    elif inr_price >= 100_000:  # 1+ Lakh INR
-        return f"₹{inr_price/100_000:.1f} L (💰 EXPENSIVE)"
-    elif inr_price >= 1_000:  # Thousands INR
-        return f"₹{inr_price:,.0f}"
-    else:
-        return f"₹{inr_price:,.2f}"
+    for minimum, divisor, number_format, label in PRICE_TIERS:
+        if inr_price >= minimum:
+            return f"₹{format(inr_price / divisor, number_format)}{label}"
+    return f"₹{format(inr_price, SMALL_PRICE_FORMAT)}"
+
+@lru_cache(maxsize=65536)
+def format_price_cached(price):
+    """
+    Memoized format_price for hot paths that format the same prices repeatedly
+    """
+    return format_price(price)
 
 def get_shipping_humor(planet_name, delivery_cost):
     """
@@ -130,7 +254,7 @@ def get_shipping_humor(planet_name, delivery_cost):
     
     return random.choice(messages)
 
-def calculate_estimated_delivery_time(planet_info):
+def calculate_estimated_delivery_time(planet_info, seed=None):
     """
     Calculate realistic delivery time based on distance and current technology
     """
@@ -148,7 +272,7 @@ def calculate_estimated_delivery_time(planet_info):
     travel_time_days = travel_time_seconds / (24 * 3600)
     
     # Double it for round trip planning and add processing time
-    total_days = (travel_time_days * 2) + random.randint(30, 90)  # Processing time
+    total_days = (travel_time_days * 2) + seeded_random(seed).randint(30, 90)  # Processing time
     
     # Format as human-readable time
     if total_days < 365:
@@ -180,13 +304,14 @@ def get_planet_emoji(planet_name):
     
     return planet_emojis.get(planet_name.lower(), '🪐')
 
-def generate_tracking_number():
+def generate_tracking_number(seed=None):
     """
     Generate a space-themed tracking number
     """
+    rng = seeded_random(seed)
     prefixes = ['SPACE', 'COSMIC', 'STELLAR', 'GALAX', 'ORBIT', 'NEBULA']
-    numbers = ''.join([str(random.randint(0, 9)) for _ in range(8)])
-    return f"{random.choice(prefixes)}-{numbers}"
+    numbers = ''.join([str(rng.randint(0, 9)) for _ in range(8)])
+    return f"{rng.choice(prefixes)}-{numbers}"
 
 def calculate_carbon_footprint(planet_info, delivery_cost):
     """
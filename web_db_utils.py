@@ -249,6 +249,40 @@ def add_search_history(product_query: str, target_planet: str, calculated_price:
         print(f"Add search history error: {e}")
         return False
 
+def get_popular_searches(per_planet: int = 20, days: int = 7) -> List[Dict]:
+    """Most searched queries per target planet over the last `days` days, most popular first"""
+    try:
+        conn = db_manager.get_connection()
+        if not conn:
+            return []
+            
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT product_query, target_planet, search_count
+            FROM (
+                SELECT LOWER(TRIM(product_query)) AS product_query, target_planet,
+                       COUNT(*) AS search_count,
+                       ROW_NUMBER() OVER (PARTITION BY target_planet ORDER BY COUNT(*) DESC) AS planet_rank
+                FROM search_history
+                WHERE created_at >= NOW() - %s * INTERVAL '1 day'
+                GROUP BY LOWER(TRIM(product_query)), target_planet
+            ) ranked
+            WHERE planet_rank <= %s
+            ORDER BY search_count DESC
+        """, (days, per_planet))
+        
+        searches = [
+            {'product_query': row[0], 'target_planet': row[1], 'search_count': row[2]}
+            for row in cursor.fetchall()
+        ]
+        cursor.close()
+        conn.close()
+        return searches
+        
+    except Exception as e:
+        print(f"Get popular searches error: {e}")
+        return []
+
 def get_analytics_data() -> Dict[str, Any]:
     """Get analytics data for dashboard"""
     try: